@@ -13,10 +13,15 @@ db.init_app(app)
 with app.app_context():
     from models.user import User
     from models.provider import ProviderConnection
-    from models.campaign import Campaign, CampaignLog
+    from models.campaign import Campaign, CampaignLog, CampaignShard
     from models.recipient_list import RecipientList, Recipient
     from models.template import EmailTemplate
     from models.suppression import SuppressionList
+    from models.job import Job, TenantShare
+    from models.rate_limit import RateLimitCounter
+    from models.dead_letter import DeadLetter
+    from models.sent_ledger import SentMessage
+    from models.provider_template import ProviderTemplate
 
 migrate = Migrate(app, db)
 
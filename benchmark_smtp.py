@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Benchmark SMTPProvider against a local aiosmtpd sink (STARTTLS + AUTH).
+
+Compares one connection per message (the old behaviour) with pooled,
+reused sessions. Needs aiosmtpd: pip install aiosmtpd
+
+    python benchmark_smtp.py --messages 500 --threads 4
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import ssl
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from providers.smtp import SMTPProvider, SMTPConnectionPool
+
+# aiosmtpd logs a deprecation warning about its own internals on every AUTH
+logging.getLogger('mail.log').setLevel(logging.ERROR)
+
+class Sink:
+    def __init__(self):
+        self.received = 0
+    
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+def self_signed_cert(directory: str):
+    """Write a localhost certificate and key; returns (cert_path, key_path)."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'localhost')])
+    now = datetime.datetime.utcnow()
+    cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key()) \
+        .serial_number(x509.random_serial_number()) \
+        .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1)) \
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName('localhost')]), critical=False) \
+        .sign(key, hashes.SHA256())
+    
+    cert_path = os.path.join(directory, 'cert.pem')
+    key_path = os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+def run(credentials: dict, messages: int, threads: int, max_messages: int) -> float:
+    SMTPConnectionPool._pools.clear()
+    provider = SMTPProvider(credentials, pool_size=threads, max_messages=max_messages)
+    
+    def send(i):
+        return provider.send(
+            from_email='bench@localhost',
+            to_email=f'rcpt{i}@localhost',
+            subject=f'Benchmark {i}',
+            html_body='<p>Hello</p>',
+            text_body='Hello'
+        )
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(send, range(messages)))
+    elapsed = time.perf_counter() - started
+    
+    failed = [r for r in results if not r['success']]
+    if failed:
+        print(f"  {len(failed)} sends failed, e.g. {failed[0]['error']}")
+    provider.pool.close()
+    return messages / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pooled vs unpooled SMTP sending')
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = self_signed_cert(directory)
+        # ssl.create_default_context() in the provider trusts this file
+        os.environ['SSL_CERT_FILE'] = cert_path
+        
+        tls_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        tls_context.load_cert_chain(cert_path, key_path)
+        
+        sink = Sink()
+        controller = Controller(
+            sink, hostname='localhost', port=args.port,
+            tls_context=tls_context, require_starttls=True,
+            authenticator=lambda *a: AuthResult(success=True), auth_require_tls=True
+        )
+        controller.start()
+        
+        credentials = {'host': 'localhost', 'port': args.port, 'username': 'bench', 'password': 'bench'}
+        
+        print("="*60)
+        print(f"  SMTP BENCHMARK - {args.messages} messages, {args.threads} threads")
+        print("="*60)
+        try:
+            unpooled = run(credentials, args.messages, args.threads, max_messages=1)
+            print(f"  New connection per message: {unpooled:8.1f} msg/s")
+            pooled = run(credentials, args.messages, args.threads, max_messages=100)
+            print(f"  Pooled sessions:            {pooled:8.1f} msg/s  ({pooled / unpooled:.1f}x)")
+        finally:
+            controller.stop()
+        print(f"  Sink received {sink.received} messages")
+
+if __name__ == '__main__':
+    main()
@@ -27,10 +27,117 @@ class Config:
     DEFAULT_SEND_RATE = int(os.getenv('DEFAULT_SEND_RATE', 100))
     MAX_RECIPIENTS_PER_CAMPAIGN = int(os.getenv('MAX_RECIPIENTS_PER_CAMPAIGN', 10000))
     
+    # Recipients fetched per keyset page while sending
+    RECIPIENT_CHUNK_SIZE = int(os.getenv('RECIPIENT_CHUNK_SIZE', 1000))
+    
+    # Campaign log batching
+    LOG_FLUSH_ROWS = int(os.getenv('LOG_FLUSH_ROWS', 500))
+    LOG_FLUSH_SECONDS = float(os.getenv('LOG_FLUSH_SECONDS', 2.0))
+    
+    # Live progress streams (/campaigns/<id>/events). Each open stream holds a
+    # web worker, so they are off unless gunicorn runs a threaded or async
+    # worker class (e.g. -k gthread --threads 16); the progress page otherwise
+    # short-polls /campaigns/<id>/progress
+    SSE_ENABLED = os.getenv('SSE_ENABLED', 'false').lower() == 'true'
+    SSE_POLL_INTERVAL = float(os.getenv('SSE_POLL_INTERVAL', 0.5))
+    SSE_MAX_SECONDS = int(os.getenv('SSE_MAX_SECONDS', 60))
+    
+    # Concurrent in-flight sends per provider connection
+    PROVIDER_CONCURRENCY = {
+        'sendgrid': int(os.getenv('SENDGRID_CONCURRENCY', 16)),
+        'mailgun': int(os.getenv('MAILGUN_CONCURRENCY', 16)),
+        'brevo': int(os.getenv('BREVO_CONCURRENCY', 8)),
+        'ses': int(os.getenv('SES_CONCURRENCY', 8)),
+        'smtp': int(os.getenv('SMTP_CONCURRENCY', 4)),
+        'gmail': int(os.getenv('GMAIL_CONCURRENCY', 1)),
+    }
+    
+    # Adaptive pacing: cut the rate by AIMD_DECREASE when a provider throttles,
+    # add back AIMD_INCREASE of the limit per second of clean sending
+    AIMD_DECREASE = float(os.getenv('AIMD_DECREASE', 0.5))
+    AIMD_INCREASE = float(os.getenv('AIMD_INCREASE', 0.05))
+    
+    # Transient send failures (timeouts, 5xx, SMTP 4xx) are retried with
+    # jittered exponential backoff, then dead-lettered
+    SEND_RETRY_ATTEMPTS = int(os.getenv('SEND_RETRY_ATTEMPTS', 4))
+    SEND_RETRY_BASE_DELAY = float(os.getenv('SEND_RETRY_BASE_DELAY', 2.0))
+    SEND_RETRY_MAX_DELAY = float(os.getenv('SEND_RETRY_MAX_DELAY', 60.0))
+    
+    # How often a sending campaign checks whether it was paused or cancelled
+    CAMPAIGN_CONTROL_SECONDS = float(os.getenv('CAMPAIGN_CONTROL_SECONDS', 0.5))
+    
+    # Campaigns with at least CAMPAIGN_SHARD_MIN_RECIPIENTS recipients per shard are
+    # split into up to CAMPAIGN_SHARDS id ranges sent by separate worker processes
+    CAMPAIGN_SHARDS = int(os.getenv('CAMPAIGN_SHARDS', os.cpu_count() or 1))
+    CAMPAIGN_SHARD_MIN_RECIPIENTS = int(os.getenv('CAMPAIGN_SHARD_MIN_RECIPIENTS', 50000))
+    
+    # Priority lanes: transactional sends always have this share of a provider's
+    # slots, and bulk sends from all workers together are held below the rest
+    # of its rate so this share stays free for transactional sends
+    PRIORITY_RESERVED_FRACTION = float(os.getenv('PRIORITY_RESERVED_FRACTION', 0.25))
+    PRIORITY_RATE_SHARE = float(os.getenv('PRIORITY_RATE_SHARE', 0.1))
+    TRANSACTIONAL_SLO_MS = int(os.getenv('TRANSACTIONAL_SLO_MS', 1000))
+    TRANSACTIONAL_TIMEOUT = int(os.getenv('TRANSACTIONAL_TIMEOUT', 30))
+    
+    # SMTP sessions are reused across messages; reconnect after this many
+    # messages or this many idle seconds
+    SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', 100))
+    SMTP_IDLE_TIMEOUT = int(os.getenv('SMTP_IDLE_TIMEOUT', 30))
+    
+    # API providers keep one keep-alive connection per concurrent send; failed
+    # connection attempts (nothing sent yet) are retried this many times
+    HTTP_CONNECT_RETRIES = int(os.getenv('HTTP_CONNECT_RETRIES', 2))
+    
+    # Most recipients sent in one API call by providers with a batch endpoint
+    # (SendGrid personalizations, Mailgun recipient-variables, SES bulk templates);
+    # 1 turns batching off. A rate-limited connection's batches are also kept to
+    # what its rate refills in SEND_BATCH_MAX_WAIT seconds (e.g. 50 at 100/minute),
+    # since a batch waits for one token per recipient before it is sent
+    SEND_BATCH_SIZE = int(os.getenv('SEND_BATCH_SIZE', 1000))
+    SEND_BATCH_MAX_WAIT = float(os.getenv('SEND_BATCH_MAX_WAIT', 30))
+    
+    # Templates: 'inline' (each send carries the rendered message) or 'stored' (the
+    # template is uploaded once to providers that support it, keyed by content
+    # hash, and sends carry only the recipient's variables)
+    TEMPLATE_MODE = os.getenv('TEMPLATE_MODE', 'inline')
+    
+    # Sending engine: 'threads' (one thread per in-flight send) or 'asyncio'
+    SEND_ENGINE = os.getenv('SEND_ENGINE', 'threads')
+    ASYNC_PROVIDER_CONCURRENCY = {
+        'sendgrid': int(os.getenv('SENDGRID_ASYNC_CONCURRENCY', 500)),
+        'mailgun': int(os.getenv('MAILGUN_ASYNC_CONCURRENCY', 500)),
+        'brevo': int(os.getenv('BREVO_ASYNC_CONCURRENCY', 200)),
+        'ses': int(os.getenv('SES_ASYNC_CONCURRENCY', 32)),
+        'smtp': int(os.getenv('SMTP_ASYNC_CONCURRENCY', 20)),
+        'gmail': int(os.getenv('GMAIL_ASYNC_CONCURRENCY', 1)),
+    }
+    
+    # Shared rate limits ('sql' uses the app database, 'redis' uses RATE_LIMIT_REDIS_URL,
+    # 'memory' is per-process)
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'sql')
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/1')
+    RATE_LIMIT_SEND_LEASE = int(os.getenv('RATE_LIMIT_SEND_LEASE', 10))
+    LOGIN_ATTEMPTS_LIMIT = int(os.getenv('LOGIN_ATTEMPTS_LIMIT', 10))
+    LOGIN_ATTEMPTS_WINDOW = int(os.getenv('LOGIN_ATTEMPTS_WINDOW', 300))
+    
     # Celery
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
     
+    # Job queue ('sql' uses the app database, 'celery' uses CELERY_BROKER_URL)
+    JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'sql')
+    JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', 300))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+    WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', 2))
+    WORKER_POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', 1.0))
+    CAMPAIGN_HEARTBEAT_TIMEOUT = int(os.getenv('CAMPAIGN_HEARTBEAT_TIMEOUT', 120))
+    SCHEDULER_RESYNC_SECONDS = int(os.getenv('SCHEDULER_RESYNC_SECONDS', 300))
+    
+    # Fair sharing between users: running campaign jobs per user while others
+    # are waiting, and how long a campaign sends before yielding its worker
+    TENANT_MAX_RUNNING_JOBS = int(os.getenv('TENANT_MAX_RUNNING_JOBS', 2))
+    CAMPAIGN_SLICE_SECONDS = int(os.getenv('CAMPAIGN_SLICE_SECONDS', 30))
+    
     # AI Providers
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
@@ -0,0 +1,26 @@
+"""Add provider pool to campaigns
+
+Revision ID: 0a7c3e5d9b42
+Revises: f1b6d4a9e327
+Create Date: 2026-10-18 14:30:05.182736
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a7c3e5d9b42'
+down_revision = 'f1b6d4a9e327'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('campaigns', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('provider_pool', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('campaigns', schema=None) as batch_op:
+        batch_op.drop_column('provider_pool')
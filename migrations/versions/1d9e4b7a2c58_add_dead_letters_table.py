@@ -0,0 +1,40 @@
+"""Add dead letters table
+
+Revision ID: 1d9e4b7a2c58
+Revises: 0a7c3e5d9b42
+Create Date: 2026-10-18 15:06:48.260913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d9e4b7a2c58'
+down_revision = '0a7c3e5d9b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dead_letters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('campaign_id', sa.Integer(), nullable=False),
+    sa.Column('recipient_id', sa.Integer(), nullable=True),
+    sa.Column('recipient_email', sa.String(length=255), nullable=False),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('replayed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('dead_letters', schema=None) as batch_op:
+        batch_op.create_index('idx_dead_letter_campaign', ['campaign_id', 'replayed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('dead_letters', schema=None) as batch_op:
+        batch_op.drop_index('idx_dead_letter_campaign')
+
+    op.drop_table('dead_letters')
@@ -0,0 +1,40 @@
+"""Add campaign shards table
+
+Revision ID: 2e5b8c1f4a73
+Revises: 1d9e4b7a2c58
+Create Date: 2026-10-18 16:12:09.511204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e5b8c1f4a73'
+down_revision = '1d9e4b7a2c58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('campaign_shards',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('campaign_id', sa.Integer(), nullable=False),
+    sa.Column('after_id', sa.Integer(), nullable=True),
+    sa.Column('until_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('last_recipient_id', sa.Integer(), nullable=True),
+    sa.Column('in_flight', sa.JSON(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('campaign_shards', schema=None) as batch_op:
+        batch_op.create_index('idx_campaign_shard', ['campaign_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('campaign_shards', schema=None) as batch_op:
+        batch_op.drop_index('idx_campaign_shard')
+
+    op.drop_table('campaign_shards')
@@ -0,0 +1,38 @@
+"""Add sent ledger table
+
+Revision ID: 4f9a1d6c3b85
+Revises: 2e5b8c1f4a73
+Create Date: 2026-10-18 17:03:41.287640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f9a1d6c3b85'
+down_revision = '2e5b8c1f4a73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sent_ledger',
+    sa.Column('idempotency_key', sa.String(length=64), nullable=False),
+    sa.Column('campaign_id', sa.Integer(), nullable=False),
+    sa.Column('recipient_id', sa.Integer(), nullable=False),
+    sa.Column('provider_id', sa.Integer(), nullable=True),
+    sa.Column('message_id', sa.String(length=255), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ),
+    sa.PrimaryKeyConstraint('idempotency_key')
+    )
+    with op.batch_alter_table('sent_ledger', schema=None) as batch_op:
+        batch_op.create_index('idx_sent_ledger_recipient', ['campaign_id', 'recipient_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sent_ledger', schema=None) as batch_op:
+        batch_op.drop_index('idx_sent_ledger_recipient')
+
+    op.drop_table('sent_ledger')
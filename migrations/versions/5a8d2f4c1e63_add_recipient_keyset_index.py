@@ -0,0 +1,26 @@
+"""Add (list_id, id) index on recipients for keyset pagination
+
+Revision ID: 5a8d2f4c1e63
+Revises: 3c1e9a7b5d20
+Create Date: 2026-10-18 10:03:17.552910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a8d2f4c1e63'
+down_revision = '3c1e9a7b5d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipients', schema=None) as batch_op:
+        batch_op.create_index('idx_list_recipient_id', ['list_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipients', schema=None) as batch_op:
+        batch_op.drop_index('idx_list_recipient_id')
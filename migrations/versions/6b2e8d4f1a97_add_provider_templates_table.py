@@ -0,0 +1,33 @@
+"""Add provider templates table
+
+Revision ID: 6b2e8d4f1a97
+Revises: 4f9a1d6c3b85
+Create Date: 2026-10-18 21:14:09.512384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2e8d4f1a97'
+down_revision = '4f9a1d6c3b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('provider_templates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('provider_id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('remote_id', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['provider_id'], ['provider_connections.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('provider_id', 'content_hash', name='uq_provider_template')
+    )
+
+
+def downgrade():
+    op.drop_table('provider_templates')
@@ -0,0 +1,38 @@
+"""Add campaign checkpoint columns and recipient ids on logs
+
+Revision ID: 8b4f0c2d7a91
+Revises: 5a8d2f4c1e63
+Create Date: 2026-10-18 10:47:05.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4f0c2d7a91'
+down_revision = '5a8d2f4c1e63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('campaigns', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_recipient_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('in_flight', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('campaign_logs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recipient_id', sa.Integer(), nullable=True))
+        batch_op.create_index('idx_campaign_recipient', ['campaign_id', 'recipient_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('campaign_logs', schema=None) as batch_op:
+        batch_op.drop_index('idx_campaign_recipient')
+        batch_op.drop_column('recipient_id')
+
+    with op.batch_alter_table('campaigns', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('in_flight')
+        batch_op.drop_column('last_recipient_id')
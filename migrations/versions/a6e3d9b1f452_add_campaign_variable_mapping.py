@@ -0,0 +1,26 @@
+"""Add variable mapping to campaigns
+
+Revision ID: a6e3d9b1f452
+Revises: 8b4f0c2d7a91
+Create Date: 2026-10-18 11:26:52.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e3d9b1f452'
+down_revision = '8b4f0c2d7a91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('campaigns', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variable_mapping', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('campaigns', schema=None) as batch_op:
+        batch_op.drop_column('variable_mapping')
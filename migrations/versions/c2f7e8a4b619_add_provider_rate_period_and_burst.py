@@ -0,0 +1,28 @@
+"""Add rate period and burst size to provider connections
+
+Revision ID: c2f7e8a4b619
+Revises: a6e3d9b1f452
+Create Date: 2026-10-18 12:08:33.971420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f7e8a4b619'
+down_revision = 'a6e3d9b1f452'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('provider_connections', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rate_period', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('burst', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('provider_connections', schema=None) as batch_op:
+        batch_op.drop_column('burst')
+        batch_op.drop_column('rate_period')
@@ -0,0 +1,26 @@
+"""Add (status, scheduled_at) index on campaigns for the scheduler
+
+Revision ID: e4c9a2f7b815
+Revises: d8a1b5e3c704
+Create Date: 2026-10-18 13:15:42.806133
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c9a2f7b815'
+down_revision = 'd8a1b5e3c704'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('campaigns', schema=None) as batch_op:
+        batch_op.create_index('idx_campaign_schedule', ['status', 'scheduled_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('campaigns', schema=None) as batch_op:
+        batch_op.drop_index('idx_campaign_schedule')
@@ -0,0 +1,37 @@
+"""Add tenant to jobs and tenant shares table
+
+Revision ID: f1b6d4a9e327
+Revises: e4c9a2f7b815
+Create Date: 2026-10-18 13:52:19.447608
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b6d4a9e327'
+down_revision = 'e4c9a2f7b815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tenant_shares',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('virtual_time', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tenant_id', sa.Integer(), nullable=True))
+        batch_op.create_index('idx_job_tenant', ['tenant_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('idx_job_tenant')
+        batch_op.drop_column('tenant_id')
+    
+    op.drop_table('tenant_shares')
@@ -7,12 +7,14 @@ class Campaign(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     provider_id = db.Column(db.Integer, db.ForeignKey('provider_connections.id'), nullable=False)
+    provider_pool = db.Column(db.JSON)
     list_id = db.Column(db.Integer, db.ForeignKey('recipient_lists.id'), nullable=False)
     name = db.Column(db.String(255), nullable=False)
     subject = db.Column(db.String(500), nullable=False)
     html_body = db.Column(db.Text)
     text_body = db.Column(db.Text)
     template_id = db.Column(db.Integer, db.ForeignKey('email_templates.id'))
+    variable_mapping = db.Column(db.JSON)
     status = db.Column(db.String(50), default='draft')
     total_recipients = db.Column(db.Integer, default=0)
     sent_count = db.Column(db.Integer, default=0)
@@ -21,15 +23,24 @@ class Campaign(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
+    last_recipient_id = db.Column(db.Integer, default=0)
+    in_flight = db.Column(db.JSON)
+    heartbeat_at = db.Column(db.DateTime)
     
     user = db.relationship('User', back_populates='campaigns')
     logs = db.relationship('CampaignLog', back_populates='campaign', cascade='all, delete-orphan')
+    shards = db.relationship('CampaignShard', back_populates='campaign', cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('idx_campaign_schedule', 'status', 'scheduled_at'),
+    )
 
 class CampaignLog(db.Model):
     __tablename__ = 'campaign_logs'
     
     id = db.Column(db.Integer, primary_key=True)
     campaign_id = db.Column(db.Integer, db.ForeignKey('campaigns.id'), nullable=False)
+    recipient_id = db.Column(db.Integer)
     recipient_email = db.Column(db.String(255), nullable=False)
     status = db.Column(db.String(50), nullable=False)
     error_message = db.Column(db.Text)
@@ -39,4 +50,24 @@ class CampaignLog(db.Model):
     
     __table_args__ = (
         db.Index('idx_campaign_status', 'campaign_id', 'status'),
+        db.Index('idx_campaign_recipient', 'campaign_id', 'recipient_id'),
+    )
+
+class CampaignShard(db.Model):
+    """Recipients with ``after_id < id <= until_id`` of a campaign split across workers."""
+    __tablename__ = 'campaign_shards'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaigns.id'), nullable=False)
+    after_id = db.Column(db.Integer, default=0)
+    until_id = db.Column(db.Integer)
+    status = db.Column(db.String(50), default='queued')
+    last_recipient_id = db.Column(db.Integer, default=0)
+    in_flight = db.Column(db.JSON)
+    heartbeat_at = db.Column(db.DateTime)
+    
+    campaign = db.relationship('Campaign', back_populates='shards')
+    
+    __table_args__ = (
+        db.Index('idx_campaign_shard', 'campaign_id', 'status'),
     )
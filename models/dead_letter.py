@@ -0,0 +1,18 @@
+from models import db
+from datetime import datetime
+
+class DeadLetter(db.Model):
+    __tablename__ = 'dead_letters'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaigns.id'), nullable=False)
+    recipient_id = db.Column(db.Integer)
+    recipient_email = db.Column(db.String(255), nullable=False)
+    error_message = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    replayed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('idx_dead_letter_campaign', 'campaign_id', 'replayed_at'),
+    )
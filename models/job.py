@@ -0,0 +1,33 @@
+from models import db
+from datetime import datetime
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    queue = db.Column(db.String(50), nullable=False, default='default')
+    kind = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON)
+    tenant_id = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=5)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_by = db.Column(db.String(255))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('idx_job_claim', 'queue', 'status', 'available_at'),
+        db.Index('idx_job_tenant', 'tenant_id', 'status'),
+    )
+
+class TenantShare(db.Model):
+    """Weighted-fair-queuing virtual time of one user's sending work."""
+    __tablename__ = 'tenant_shares'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    virtual_time = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -15,6 +15,8 @@ class ProviderConnection(db.Model):
     health_status = db.Column(db.String(50), default='unknown')
     last_verified_at = db.Column(db.DateTime)
     rate_limit = db.Column(db.Integer, default=100)
+    rate_period = db.Column(db.String(20), default='minute')
+    burst = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', back_populates='providers')
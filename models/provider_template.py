@@ -0,0 +1,17 @@
+from models import db
+from datetime import datetime
+
+class ProviderTemplate(db.Model):
+    __tablename__ = 'provider_templates'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    provider_id = db.Column(db.Integer, db.ForeignKey('provider_connections.id', ondelete='CASCADE'), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    remote_id = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    provider = db.relationship('ProviderConnection', backref=db.backref('stored_templates', cascade='all, delete-orphan'))
+    
+    __table_args__ = (
+        db.UniqueConstraint('provider_id', 'content_hash', name='uq_provider_template'),
+    )
@@ -0,0 +1,10 @@
+from models import db
+
+class RateLimitCounter(db.Model):
+    __tablename__ = 'rate_limits'
+    
+    key = db.Column(db.String(255), primary_key=True)
+    window_start = db.Column(db.Float, nullable=False)
+    prev_count = db.Column(db.Integer, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
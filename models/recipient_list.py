@@ -25,4 +25,5 @@ class Recipient(db.Model):
     
     __table_args__ = (
         db.Index('idx_list_email', 'list_id', 'email'),
+        db.Index('idx_list_recipient_id', 'list_id', 'id'),
     )
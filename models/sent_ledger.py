@@ -0,0 +1,16 @@
+from models import db
+from datetime import datetime
+
+class SentMessage(db.Model):
+    __tablename__ = 'sent_ledger'
+    
+    idempotency_key = db.Column(db.String(64), primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaigns.id'), nullable=False)
+    recipient_id = db.Column(db.Integer, nullable=False)
+    provider_id = db.Column(db.Integer)
+    message_id = db.Column(db.String(255))
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_sent_ledger_recipient', 'campaign_id', 'recipient_id'),
+    )
@@ -4,6 +4,7 @@ from providers.brevo import BrevoProvider
 from providers.mailgun import MailgunProvider
 from providers.ses import SESProvider
 from providers.smtp import SMTPProvider
+from providers.base import BaseProvider, AsyncBaseProvider, ExecutorProviderAdapter
 
 PROVIDER_MAP = {
     'gmail': GmailProvider,
@@ -1,14 +1,189 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, lru_cache
 from typing import Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
+import hashlib
+import re
+import requests
+import threading
+
+# HTTP statuses worth retrying later: timeouts, rate limiting and server errors
+TRANSIENT_HTTP_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Carries a message's idempotency key so a resend of the same message can be recognised
+IDEMPOTENCY_HEADER = 'X-Idempotency-Key'
+
+# Provider template tokens for placeholder vN; HANDLEBARS uses triple braces so values are not HTML-escaped
+HANDLEBARS_TOKEN = '{{{{{{{name}}}}}}}'
+MAILGUN_TOKEN = '%recipient.{name}%'
+BREVO_TOKEN = '{{{{ params.{name} }}}}'
+
+# A [key] or {{key}} placeholder
+_PLACEHOLDER = re.compile(r'\[[^\[\]\n]+\]|\{\{[^{}\n]+\}\}')
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def pooled_session(key: tuple, base_url: str, pool_size: int = 10, retries: int = 2, prewarm: bool = False) -> requests.Session:
+    """Keep-alive session shared by every provider instance with the same ``key``.
+
+    Its pool keeps up to ``pool_size`` connections to the provider API open,
+    so a send costs one request round trip instead of a TCP and TLS
+    handshake. Adapter retries only cover failures to connect, where nothing
+    was sent; other errors are left to the engine's RetryPolicy, so a POST is
+    never silently repeated and throttling still reaches the AIMD controller.
+    """
+    with _sessions_lock:
+        entry = _sessions.get(key)
+        if entry and entry[1] >= pool_size:
+            return entry[0]
+        
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=retries, connect=retries, read=0, status=0, other=0, backoff_factor=0.2)
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _sessions[key] = (session, pool_size)
+    
+    if prewarm:
+        thread = threading.Thread(target=_prewarm, args=(session, base_url, pool_size), name='http-prewarm')
+        thread.daemon = True
+        thread.start()
+    return session
+
+def _prewarm(session: requests.Session, base_url: str, connections: int):
+    """Open ``connections`` keep-alive connections ahead of the first sends."""
+    def touch(_):
+        try:
+            session.head(base_url, timeout=10)
+        except requests.RequestException:
+            pass
+    
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        list(executor.map(touch, range(connections)))
+
+def substitutions(template: str, variables: dict) -> dict:
+    """Map each ``[key]``/``{{key}}`` placeholder used in ``template`` to its value.
+
+    Mirrors TemplateEngine.render, so a provider substituting these
+    server-side produces the same message as rendering locally.
+    """
+    tags = {}
+    for key, value in variables.items():
+        for tag in (f'[{key}]', f'{{{{{key}}}}}'):
+            if tag in template:
+                tags[tag] = str(value)
+    return tags
+
+def substitute(text: str, tags: dict) -> str:
+    for tag, value in tags.items():
+        text = text.replace(tag, value)
+    return text
+
+def render_batch_message(template: dict, message: dict) -> dict:
+    """Render one message of a batch locally, as keyword arguments for ``send``."""
+    placeholders = '\n'.join([template['subject'], template['html_body'], template.get('text_body') or ''])
+    tags = substitutions(placeholders, message.get('variables') or {})
+    rendered = {
+        'to_email': message['to_email'],
+        'subject': substitute(template['subject'], tags),
+        'html_body': substitute(template['html_body'], tags),
+        'text_body': substitute(template['text_body'], tags) if template.get('text_body') else None
+    }
+    if message.get('idempotency_key'):
+        rendered['idempotency_key'] = message['idempotency_key']
+    return rendered
+
+@lru_cache(maxsize=64)
+def indexed_template(subject: str, html_body: str, text_body: str, token: str) -> tuple:
+    """Swap each distinct placeholder for ``token`` named v0, v1, ... in order of appearance.
+
+    Unlike per-recipient substitutions this does not depend on anyone's
+    variables, so the result can be stored with a provider and reused.
+    Returns the converted subject, html and text, and the placeholders.
+    """
+    placeholders = []
+    
+    def replace(match):
+        if match.group(0) not in placeholders:
+            placeholders.append(match.group(0))
+        return token.format(name=f'v{placeholders.index(match.group(0))}')
+    
+    converted = [_PLACEHOLDER.sub(replace, text) for text in (subject, html_body, text_body)]
+    return converted[0], converted[1], converted[2], tuple(placeholders)
+
+def indexed_variables(placeholders: tuple, variables: dict) -> dict:
+    """One recipient's values for an indexed template; a placeholder without a variable renders as itself."""
+    values = {}
+    for index, placeholder in enumerate(placeholders):
+        key = placeholder[1:-1] if placeholder.startswith('[') else placeholder[2:-2]
+        values[f'v{index}'] = str(variables[key]) if key in variables else placeholder
+    return values
+
+def template_name(template: dict, *extra: str) -> str:
+    """A provider template name derived from the template's content."""
+    content = '\0'.join([template['subject'], template['html_body'], template.get('text_body') or '', *extra])
+    return f'lapsli-{hashlib.sha256(content.encode()).hexdigest()[:40]}'
+
+def batch_failure(status_code: int, error: str, count: int) -> list:
+    """The same failed result for every message of a rejected batch request."""
+    return [{
+        'success': False,
+        'error': error,
+        'throttled': status_code == 429,
+        'transient': status_code in TRANSIENT_HTTP_STATUSES
+    } for _ in range(count)]
+
+class ProviderCapabilities:
+    """What a provider supports beyond one ``send`` per message.
+
+    The sending engine reads these to pick how it dispatches to a provider:
+    batches of up to ``max_batch_size`` messages, rendered by the provider
+    when it has ``server_side_templating``; idempotency keys only when the
+    provider can carry them; no more than ``max_concurrency`` calls in
+    flight, if set. With ``stored_templates`` the campaign template can be
+    uploaded once (``store_template``) so sends carry only variables.
+    """
+    
+    def __init__(self, max_batch_size: int = 1, server_side_templating: bool = False,
+                 idempotency_keys: bool = False, max_concurrency: int = None, stored_templates: bool = False):
+        self.max_batch_size = max_batch_size
+        self.server_side_templating = server_side_templating
+        self.idempotency_keys = idempotency_keys
+        self.max_concurrency = max_concurrency
+        self.stored_templates = stored_templates
 
 class BaseProvider(ABC):
+    capabilities = ProviderCapabilities()
+    
     def __init__(self, credentials: Dict[str, Any]):
         self.credentials = credentials
     
     @abstractmethod
-    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None) -> Dict[str, Any]:
+    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> Dict[str, Any]:
         pass
     
+    def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        """Send several messages; returns a result per message, in order.
+
+        Messages are ``send`` keyword arguments, or, with a ``template``,
+        dicts of ``to_email``, ``variables`` and ``idempotency_key`` to fill
+        it in with. This default renders locally and sends one at a time.
+        """
+        if template is not None:
+            messages = [render_batch_message(template, message) for message in messages]
+        return [self.send(from_email=from_email, **message) for message in messages]
+    
+    def store_template(self, from_email: str, template: dict) -> str:
+        """Upload a campaign template; returns the id that ``send_batch`` accepts as ``template['template_id']``."""
+        raise NotImplementedError
+    
     @abstractmethod
     def verify(self) -> Dict[str, Any]:
         pass
@@ -16,3 +191,71 @@ class BaseProvider(ABC):
     @abstractmethod
     def get_rate_limit(self) -> int:
         pass
+    
+    def close(self):
+        """Release anything set up for a campaign run, such as stored templates."""
+        pass
+
+class AsyncBaseProvider(ABC):
+    capabilities = ProviderCapabilities()
+    
+    def __init__(self, credentials: Dict[str, Any]):
+        self.credentials = credentials
+    
+    @abstractmethod
+    async def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> Dict[str, Any]:
+        pass
+    
+    async def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        if template is not None:
+            messages = [render_batch_message(template, message) for message in messages]
+        return list(await asyncio.gather(*[self.send(from_email=from_email, **message) for message in messages]))
+    
+    async def store_template(self, from_email: str, template: dict) -> str:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def verify(self) -> Dict[str, Any]:
+        pass
+    
+    @abstractmethod
+    def get_rate_limit(self) -> int:
+        pass
+    
+    async def aclose(self):
+        pass
+
+class ExecutorProviderAdapter(AsyncBaseProvider):
+    """Runs a blocking provider in a thread pool so it can be awaited."""
+    
+    def __init__(self, provider: BaseProvider, max_workers: int = 8):
+        self.provider = provider
+        self.credentials = provider.credentials
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=type(provider).__name__)
+    
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+    
+    async def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> Dict[str, Any]:
+        return await self._call(self.provider.send, from_email, to_email, subject, html_body, text_body, idempotency_key)
+    
+    @property
+    def capabilities(self) -> ProviderCapabilities:
+        return self.provider.capabilities
+    
+    async def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        return await self._call(self.provider.send_batch, from_email, messages, template)
+    
+    async def store_template(self, from_email: str, template: dict) -> str:
+        return await self._call(self.provider.store_template, from_email, template)
+    
+    async def verify(self) -> Dict[str, Any]:
+        return await self._call(self.provider.verify)
+    
+    def get_rate_limit(self) -> int:
+        return self.provider.get_rate_limit()
+    
+    async def aclose(self):
+        await self._call(self.provider.close)
+        self.executor.shutdown(wait=False)
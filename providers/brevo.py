@@ -1,23 +1,79 @@
-from providers.base import BaseProvider
+from providers.base import BaseProvider, AsyncBaseProvider, ProviderCapabilities, TRANSIENT_HTTP_STATUSES, IDEMPOTENCY_HEADER, BREVO_TOKEN, pooled_session, render_batch_message, indexed_template, indexed_variables, template_name
+import asyncio
 import requests
+import httpx
+
+def _build_payload(from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
+    payload = {
+        'sender': {'email': from_email},
+        'to': [{'email': to_email}],
+        'subject': subject,
+        'htmlContent': html_body,
+        'textContent': text_body or ''
+    }
+    if idempotency_key:
+        payload['headers'] = {IDEMPOTENCY_HEADER: idempotency_key}
+    return payload
+
+def _stored_template(from_email: str, template: dict) -> dict:
+    """Payload creating the Brevo template for a campaign template; Brevo templates carry a sender."""
+    subject, html_body, _, _ = indexed_template(
+        template['subject'], template['html_body'], template.get('text_body') or '', BREVO_TOKEN
+    )
+    return {
+        'templateName': template_name(template, from_email),
+        'sender': {'email': from_email},
+        'subject': subject,
+        'htmlContent': html_body,
+        'isActive': True
+    }
+
+def _build_template_payload(from_email: str, template: dict, message: dict) -> dict:
+    """A send of a stored template: only the recipient's params travel with it."""
+    placeholders = indexed_template(
+        template['subject'], template['html_body'], template.get('text_body') or '', BREVO_TOKEN
+    )[3]
+    payload = {
+        'sender': {'email': from_email},
+        'to': [{'email': message['to_email']}],
+        'templateId': int(template['template_id']),
+        'params': indexed_variables(placeholders, message.get('variables') or {})
+    }
+    if message.get('idempotency_key'):
+        payload['headers'] = {IDEMPOTENCY_HEADER: message['idempotency_key']}
+    return payload
+
+def _template_result(response) -> dict:
+    """Result of a stored-template send, or None if it should be retried as a rendered send."""
+    if response.status_code == 201:
+        return {'success': True, 'message_id': response.json().get('messageId')}
+    if response.status_code in TRANSIENT_HTTP_STATUSES:
+        return {
+            'success': False,
+            'error': response.text,
+            'throttled': response.status_code == 429,
+            'transient': True
+        }
+    return None
 
 class BrevoProvider(BaseProvider):
-    def __init__(self, credentials: dict):
+    # Sends one message per request, but can send a stored template with only its params
+    capabilities = ProviderCapabilities(idempotency_keys=True, stored_templates=True)
+    
+    def __init__(self, credentials: dict, pool_size: int = 10, retries: int = 2, prewarm: bool = False):
         super().__init__(credentials)
         self.api_key = credentials['api_key']
         self.base_url = 'https://api.brevo.com/v3'
+        self.session = pooled_session(
+            ('brevo', self.base_url, self.api_key), self.base_url,
+            pool_size=pool_size, retries=retries, prewarm=prewarm
+        )
     
-    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None) -> dict:
+    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
         try:
-            payload = {
-                'sender': {'email': from_email},
-                'to': [{'email': to_email}],
-                'subject': subject,
-                'htmlContent': html_body,
-                'textContent': text_body or ''
-            }
+            payload = _build_payload(from_email, to_email, subject, html_body, text_body, idempotency_key)
             
-            response = requests.post(
+            response = self.session.post(
                 f'{self.base_url}/smtp/email',
                 json=payload,
                 headers={'api-key': self.api_key},
@@ -27,13 +83,57 @@ class BrevoProvider(BaseProvider):
             if response.status_code == 201:
                 return {'success': True, 'message_id': response.json().get('messageId')}
             else:
-                return {'success': False, 'error': response.text}
+                return {
+                    'success': False,
+                    'error': response.text,
+                    'throttled': response.status_code == 429,
+                    'transient': response.status_code in TRANSIENT_HTTP_STATUSES
+                }
+        except (requests.Timeout, requests.ConnectionError) as e:
+            return {'success': False, 'error': str(e), 'transient': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        """Send each message with the stored template ``template['template_id']``, if there is one.
+
+        A message the template send is rejected for (the template was
+        deleted, say) is sent rendered instead.
+        """
+        if not template or not template.get('template_id'):
+            return super().send_batch(from_email, messages, template)
+        
+        results = []
+        for message in messages:
+            try:
+                response = self.session.post(
+                    f'{self.base_url}/smtp/email',
+                    json=_build_template_payload(from_email, template, message),
+                    headers={'api-key': self.api_key},
+                    timeout=30
+                )
+                result = _template_result(response)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                result = {'success': False, 'error': str(e), 'transient': True}
+            except Exception:
+                result = None
+            results.append(result or self.send(from_email=from_email, **render_batch_message(template, message)))
+        return results
+    
+    def store_template(self, from_email: str, template: dict) -> str:
+        """Create a Brevo template for the campaign template; returns its templateId."""
+        response = self.session.post(
+            f'{self.base_url}/smtp/templates',
+            json=_stored_template(from_email, template),
+            headers={'api-key': self.api_key},
+            timeout=30
+        )
+        response.raise_for_status()
+        return str(response.json()['id'])
+    
     def verify(self) -> dict:
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.base_url}/account',
                 headers={'api-key': self.api_key},
                 timeout=10
@@ -46,3 +146,77 @@ class BrevoProvider(BaseProvider):
     
     def get_rate_limit(self) -> int:
         return 300
+
+class AsyncBrevoProvider(AsyncBaseProvider):
+    capabilities = BrevoProvider.capabilities
+    
+    def __init__(self, credentials: dict):
+        super().__init__(credentials)
+        self.api_key = credentials['api_key']
+        self.base_url = 'https://api.brevo.com/v3'
+        self.client = None
+    
+    def _client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'api-key': self.api_key},
+                timeout=30
+            )
+        return self.client
+    
+    async def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
+        try:
+            payload = _build_payload(from_email, to_email, subject, html_body, text_body, idempotency_key)
+            response = await self._client().post('/smtp/email', json=payload)
+            
+            if response.status_code == 201:
+                return {'success': True, 'message_id': response.json().get('messageId')}
+            else:
+                return {
+                    'success': False,
+                    'error': response.text,
+                    'throttled': response.status_code == 429,
+                    'transient': response.status_code in TRANSIENT_HTTP_STATUSES
+                }
+        except httpx.TransportError as e:
+            return {'success': False, 'error': str(e), 'transient': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    async def _send_template(self, from_email: str, template: dict, message: dict) -> dict:
+        try:
+            response = await self._client().post('/smtp/email', json=_build_template_payload(from_email, template, message))
+            result = _template_result(response)
+        except httpx.TransportError as e:
+            result = {'success': False, 'error': str(e), 'transient': True}
+        except Exception:
+            result = None
+        return result or await self.send(from_email=from_email, **render_batch_message(template, message))
+    
+    async def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        if not template or not template.get('template_id'):
+            return await super().send_batch(from_email, messages, template)
+        return list(await asyncio.gather(*[self._send_template(from_email, template, message) for message in messages]))
+    
+    async def store_template(self, from_email: str, template: dict) -> str:
+        response = await self._client().post('/smtp/templates', json=_stored_template(from_email, template))
+        response.raise_for_status()
+        return str(response.json()['id'])
+    
+    async def verify(self) -> dict:
+        try:
+            response = await self._client().get('/account', timeout=10)
+            if response.status_code == 200:
+                return {'success': True}
+            return {'success': False, 'error': response.text}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_rate_limit(self) -> int:
+        return 300
+    
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
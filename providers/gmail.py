@@ -1,10 +1,13 @@
-from providers.base import BaseProvider
+from providers.base import BaseProvider, ProviderCapabilities, TRANSIENT_HTTP_STATUSES, IDEMPOTENCY_HEADER
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from email.mime.text import MIMEText
 import base64
 
 class GmailProvider(BaseProvider):
+    capabilities = ProviderCapabilities(idempotency_keys=True)
+    
     def __init__(self, credentials: dict):
         self.credentials = Credentials(
             token=credentials.get('access_token'),
@@ -14,7 +17,7 @@ class GmailProvider(BaseProvider):
             client_secret=credentials.get('client_secret')
         )
     
-    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None) -> dict:
+    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
         try:
             service = build('gmail', 'v1', credentials=self.credentials)
             
@@ -22,12 +25,25 @@ class GmailProvider(BaseProvider):
             message['to'] = to_email
             message['from'] = from_email
             message['subject'] = subject
+            if idempotency_key:
+                message['Message-ID'] = f"<{idempotency_key}@{from_email.rsplit('@', 1)[-1]}>"
+                message[IDEMPOTENCY_HEADER] = idempotency_key
             
             raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
             body = {'raw': raw}
             
             result = service.users().messages().send(userId='me', body=body).execute()
             return {'success': True, 'message_id': result['id']}
+        except HttpError as e:
+            throttled = e.resp.status == 429 or 'rateLimitExceeded' in str(e)
+            return {
+                'success': False,
+                'error': str(e),
+                'throttled': throttled,
+                'transient': throttled or e.resp.status in TRANSIENT_HTTP_STATUSES
+            }
+        except OSError as e:
+            return {'success': False, 'error': str(e), 'transient': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
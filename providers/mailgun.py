@@ -1,38 +1,225 @@
-from providers.base import BaseProvider
+from providers.base import BaseProvider, AsyncBaseProvider, ProviderCapabilities, TRANSIENT_HTTP_STATUSES, IDEMPOTENCY_HEADER, MAILGUN_TOKEN, pooled_session, render_batch_message, batch_failure, indexed_template, indexed_variables, template_name
+from functools import lru_cache
+import asyncio
+import json
+import re
 import requests
+import httpx
+
+# Recipient variable names Mailgun can use in a %recipient.name% token
+_TOKEN_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+def _build_data(from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
+    data = {
+        'from': from_email,
+        'to': to_email,
+        'subject': subject,
+        'text': text_body or '',
+        'html': html_body
+    }
+    if idempotency_key:
+        data[f'h:{IDEMPOTENCY_HEADER}'] = idempotency_key
+        data['v:idempotency_key'] = idempotency_key
+    return data
+
+def _placeholders(template: dict) -> str:
+    return '\n'.join([template['subject'], template['html_body'], template.get('text_body') or ''])
+
+@lru_cache(maxsize=32)
+def _tokenize(subject: str, html_body: str, text_body: str, keys: tuple) -> tuple:
+    """Swap each key's ``[key]``/``{{key}}`` placeholders for a ``%recipient.name%`` token.
+
+    Cached, so a campaign's template is converted once rather than per batch.
+    Keys Mailgun cannot name (spaces, punctuation) get a ``varN`` alias.
+    Returns the converted subject, html and text, and each key's token name.
+    """
+    names = {key: key for key in keys if _TOKEN_NAME.match(key)}
+    aliases = (f'var{i}' for i in range(len(keys) + len(names) + 1))
+    for key in keys:
+        if key not in names:
+            names[key] = next(alias for alias in aliases if alias not in names.values())
+    
+    def convert(text: str) -> str:
+        for key, name in names.items():
+            text = text.replace(f'[{key}]', f'%recipient.{name}%').replace(f'{{{{{key}}}}}', f'%recipient.{name}%')
+        return text
+    
+    return convert(subject), convert(html_body), convert(text_body), names
+
+def _build_batch_data(from_email: str, template: dict, messages: list) -> dict:
+    """One /messages request for every message, personalised with recipient-variables.
+
+    Mailgun sends each ``to`` address its own copy. A recipient without a
+    value for a placeholder gets the placeholder itself, as in local rendering.
+    """
+    if template.get('template_id'):
+        return _build_stored_batch_data(from_email, template, messages)
+    placeholders = _placeholders(template)
+    keys = sorted({
+        key for message in messages for key in (message.get('variables') or {})
+        if f'[{key}]' in placeholders or f'{{{{{key}}}}}' in placeholders
+    })
+    subject, html_body, text_body, names = _tokenize(
+        template['subject'], template['html_body'], template.get('text_body') or '', tuple(keys)
+    )
+    
+    recipient_variables = {}
+    for message in messages:
+        variables = message.get('variables') or {}
+        values = {
+            name: str(variables[key]) if key in variables else (f'[{key}]' if f'[{key}]' in placeholders else f'{{{{{key}}}}}')
+            for key, name in names.items()
+        }
+        if message.get('idempotency_key'):
+            values['idempotency_key'] = message['idempotency_key']
+        recipient_variables[message['to_email']] = values
+    
+    data = {
+        'from': from_email,
+        'to': [message['to_email'] for message in messages],
+        'subject': subject,
+        'text': text_body,
+        'html': html_body,
+        'recipient-variables': json.dumps(recipient_variables)
+    }
+    if any(message.get('idempotency_key') for message in messages):
+        data[f'h:{IDEMPOTENCY_HEADER}'] = '%recipient.idempotency_key%'
+        data['v:idempotency_key'] = '%recipient.idempotency_key%'
+    return data
+
+def _build_stored_batch_data(from_email: str, template: dict, messages: list) -> dict:
+    """Batch data for a stored template: only the subject and each recipient's values are sent."""
+    subject, _, _, placeholders = indexed_template(
+        template['subject'], template['html_body'], template.get('text_body') or '', MAILGUN_TOKEN
+    )
+    recipient_variables = {}
+    for message in messages:
+        values = indexed_variables(placeholders, message.get('variables') or {})
+        if message.get('idempotency_key'):
+            values['idempotency_key'] = message['idempotency_key']
+        recipient_variables[message['to_email']] = values
+    
+    data = {
+        'from': from_email,
+        'to': [message['to_email'] for message in messages],
+        'subject': subject,
+        'template': template['template_id'],
+        't:text': 'yes',
+        'recipient-variables': json.dumps(recipient_variables)
+    }
+    if any(message.get('idempotency_key') for message in messages):
+        data[f'h:{IDEMPOTENCY_HEADER}'] = '%recipient.idempotency_key%'
+        data['v:idempotency_key'] = '%recipient.idempotency_key%'
+    return data
+
+def _stored_template(template: dict) -> dict:
+    """Form data creating the Mailgun template for a campaign template."""
+    _, html_body, _, _ = indexed_template(
+        template['subject'], template['html_body'], template.get('text_body') or '', MAILGUN_TOKEN
+    )
+    return {'name': template_name(template), 'template': html_body, 'description': 'Campaign template'}
+
+def _split_repeats(messages: list) -> tuple:
+    """Indexes of messages that can share a batch, and of repeated addresses that must go on their own."""
+    seen = set()
+    batched, repeats = [], []
+    for index, message in enumerate(messages):
+        address = message['to_email'].lower()
+        (repeats if address in seen else batched).append(index)
+        seen.add(address)
+    return batched, repeats
 
 class MailgunProvider(BaseProvider):
-    def __init__(self, credentials: dict):
+    # Up to 1000 'to' addresses per batch send, filled in from recipient-variables
+    capabilities = ProviderCapabilities(max_batch_size=1000, server_side_templating=True, idempotency_keys=True,
+                                        stored_templates=True)
+    
+    def __init__(self, credentials: dict, pool_size: int = 10, retries: int = 2, prewarm: bool = False):
         super().__init__(credentials)
         self.api_key = credentials['api_key']
         self.domain = credentials['domain']
         self.base_url = f'https://api.mailgun.net/v3/{self.domain}'
+        self.session = pooled_session(
+            ('mailgun', self.base_url, self.api_key), self.base_url,
+            pool_size=pool_size, retries=retries, prewarm=prewarm
+        )
     
-    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None) -> dict:
+    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
         try:
-            response = requests.post(
+            response = self.session.post(
                 f'{self.base_url}/messages',
                 auth=('api', self.api_key),
-                data={
-                    'from': from_email,
-                    'to': to_email,
-                    'subject': subject,
-                    'text': text_body or '',
-                    'html': html_body
-                },
+                data=_build_data(from_email, to_email, subject, html_body, text_body, idempotency_key),
                 timeout=30
             )
             
             if response.status_code == 200:
                 return {'success': True, 'message_id': response.json().get('id')}
             else:
-                return {'success': False, 'error': response.text}
+                return {
+                    'success': False,
+                    'error': response.text,
+                    'throttled': response.status_code == 429,
+                    'transient': response.status_code in TRANSIENT_HTTP_STATUSES
+                }
+        except (requests.Timeout, requests.ConnectionError) as e:
+            return {'success': False, 'error': str(e), 'transient': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        """Send templated ``messages`` as one batch; returns a result per message, in order.
+
+        Recipient-variables are keyed by address, so a repeated address is
+        sent on its own. If Mailgun rejects the batch for any reason other
+        than throttling or a server error, every message is sent on its own.
+        """
+        if template is None:
+            return super().send_batch(from_email, messages)
+        batched, repeats = _split_repeats(messages)
+        results = [None] * len(messages)
+        try:
+            response = self.session.post(
+                f'{self.base_url}/messages',
+                auth=('api', self.api_key),
+                data=_build_batch_data(from_email, template, [messages[i] for i in batched]),
+                timeout=60
+            )
+            
+            if response.status_code == 200:
+                message_id = response.json().get('id')
+                for i in batched:
+                    results[i] = {'success': True, 'message_id': message_id}
+            elif response.status_code in TRANSIENT_HTTP_STATUSES:
+                for i, result in zip(batched, batch_failure(response.status_code, response.text, len(batched))):
+                    results[i] = result
+            else:
+                repeats = range(len(messages))
+        except (requests.Timeout, requests.ConnectionError) as e:
+            for i in batched:
+                results[i] = {'success': False, 'error': str(e), 'transient': True}
+        except Exception as e:
+            for i in batched:
+                results[i] = {'success': False, 'error': str(e)}
+        
+        for i in repeats:
+            results[i] = self.send(from_email=from_email, **render_batch_message(template, messages[i]))
+        return results
+    
+    def store_template(self, from_email: str, template: dict) -> str:
+        """Create a stored template for the campaign template, unless it exists; returns its name."""
+        data = _stored_template(template)
+        response = self.session.get(f'{self.base_url}/templates/{data["name"]}', auth=('api', self.api_key), timeout=30)
+        if response.status_code == 200:
+            return data['name']
+        
+        response = self.session.post(f'{self.base_url}/templates', auth=('api', self.api_key), data=data, timeout=30)
+        response.raise_for_status()
+        return data['name']
+    
     def verify(self) -> dict:
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.base_url}/domains/{self.domain}',
                 auth=('api', self.api_key),
                 timeout=10
@@ -45,3 +232,105 @@ class MailgunProvider(BaseProvider):
     
     def get_rate_limit(self) -> int:
         return 1000
+
+class AsyncMailgunProvider(AsyncBaseProvider):
+    capabilities = MailgunProvider.capabilities
+    
+    def __init__(self, credentials: dict):
+        super().__init__(credentials)
+        self.api_key = credentials['api_key']
+        self.domain = credentials['domain']
+        self.base_url = f'https://api.mailgun.net/v3/{self.domain}'
+        self.client = None
+    
+    def _client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=('api', self.api_key),
+                timeout=30
+            )
+        return self.client
+    
+    async def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
+        try:
+            response = await self._client().post(
+                '/messages',
+                data=_build_data(from_email, to_email, subject, html_body, text_body, idempotency_key)
+            )
+            
+            if response.status_code == 200:
+                return {'success': True, 'message_id': response.json().get('id')}
+            else:
+                return {
+                    'success': False,
+                    'error': response.text,
+                    'throttled': response.status_code == 429,
+                    'transient': response.status_code in TRANSIENT_HTTP_STATUSES
+                }
+        except httpx.TransportError as e:
+            return {'success': False, 'error': str(e), 'transient': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    async def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        if template is None:
+            return await super().send_batch(from_email, messages)
+        batched, repeats = _split_repeats(messages)
+        results = [None] * len(messages)
+        try:
+            response = await self._client().post(
+                '/messages',
+                data=_build_batch_data(from_email, template, [messages[i] for i in batched]),
+                timeout=60
+            )
+            
+            if response.status_code == 200:
+                message_id = response.json().get('id')
+                for i in batched:
+                    results[i] = {'success': True, 'message_id': message_id}
+            elif response.status_code in TRANSIENT_HTTP_STATUSES:
+                for i, result in zip(batched, batch_failure(response.status_code, response.text, len(batched))):
+                    results[i] = result
+            else:
+                repeats = range(len(messages))
+        except httpx.TransportError as e:
+            for i in batched:
+                results[i] = {'success': False, 'error': str(e), 'transient': True}
+        except Exception as e:
+            for i in batched:
+                results[i] = {'success': False, 'error': str(e)}
+        
+        singles = await asyncio.gather(*[
+            self.send(from_email=from_email, **render_batch_message(template, messages[i])) for i in repeats
+        ])
+        for i, result in zip(repeats, singles):
+            results[i] = result
+        return results
+    
+    async def store_template(self, from_email: str, template: dict) -> str:
+        data = _stored_template(template)
+        response = await self._client().get(f'/templates/{data["name"]}')
+        if response.status_code == 200:
+            return data['name']
+        
+        response = await self._client().post('/templates', data=data)
+        response.raise_for_status()
+        return data['name']
+    
+    async def verify(self) -> dict:
+        try:
+            response = await self._client().get(f'/domains/{self.domain}', timeout=10)
+            if response.status_code == 200:
+                return {'success': True}
+            return {'success': False, 'error': response.text}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_rate_limit(self) -> int:
+        return 1000
+    
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
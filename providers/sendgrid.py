@@ -1,25 +1,104 @@
-from providers.base import BaseProvider
+from providers.base import BaseProvider, AsyncBaseProvider, ProviderCapabilities, TRANSIENT_HTTP_STATUSES, IDEMPOTENCY_HEADER, HANDLEBARS_TOKEN, pooled_session, substitutions, substitute, render_batch_message, batch_failure, indexed_template, indexed_variables, template_name
+import asyncio
 import requests
+import httpx
+
+def _build_payload(from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
+    payload = {
+        'personalizations': [{'to': [{'email': to_email}]}],
+        'from': {'email': from_email},
+        'subject': subject,
+        'content': [
+            {'type': 'text/plain', 'value': text_body or ''},
+            {'type': 'text/html', 'value': html_body}
+        ]
+    }
+    if idempotency_key:
+        payload['headers'] = {IDEMPOTENCY_HEADER: idempotency_key}
+        payload['custom_args'] = {'idempotency_key': idempotency_key}
+    return payload
+
+def _build_batch_payload(from_email: str, template: dict, messages: list) -> dict:
+    """One mail/send payload with a personalization per message.
+
+    The template's ``[key]``/``{{key}}`` placeholders are filled in by
+    SendGrid from each personalization's substitutions. With a stored
+    dynamic template (``template_id``) only each recipient's values are sent.
+    """
+    text_body = template.get('text_body') or ''
+    html_body = template['html_body']
+    placeholders = '\n'.join([template['subject'], html_body, text_body])
+    stored = template.get('template_id')
+    if stored:
+        indexed = indexed_template(template['subject'], html_body, text_body, HANDLEBARS_TOKEN)[3]
+    
+    personalizations = []
+    for message in messages:
+        variables = message.get('variables') or {}
+        if stored:
+            personalization = {
+                'to': [{'email': message['to_email']}],
+                'dynamic_template_data': indexed_variables(indexed, variables)
+            }
+        else:
+            message_tags = substitutions(placeholders, variables)
+            personalization = {
+                'to': [{'email': message['to_email']}],
+                'subject': substitute(template['subject'], message_tags),
+                'substitutions': message_tags
+            }
+        if message.get('idempotency_key'):
+            personalization['headers'] = {IDEMPOTENCY_HEADER: message['idempotency_key']}
+            personalization['custom_args'] = {'idempotency_key': message['idempotency_key']}
+        personalizations.append(personalization)
+    
+    if stored:
+        return {'personalizations': personalizations, 'from': {'email': from_email}, 'template_id': stored}
+    
+    payload = {
+        'personalizations': personalizations,
+        'from': {'email': from_email},
+        'subject': template['subject'],
+        'content': [
+            {'type': 'text/plain', 'value': text_body},
+            {'type': 'text/html', 'value': html_body}
+        ]
+    }
+    return payload
+
+def _dynamic_template(template: dict) -> tuple:
+    """Name and active version of the dynamic template for a campaign template."""
+    subject, html_body, text_body, _ = indexed_template(
+        template['subject'], template['html_body'], template.get('text_body') or '', HANDLEBARS_TOKEN
+    )
+    name = template_name(template)
+    version = {'name': name, 'subject': subject, 'html_content': html_body, 'active': 1}
+    if text_body:
+        version['plain_content'] = text_body
+    else:
+        version['generate_plain_content'] = True
+    return name, version
 
 class SendGridProvider(BaseProvider):
-    def __init__(self, credentials: dict):
+    # Up to 1000 personalizations per mail/send request, filled in from substitutions
+    # or from the data for a stored dynamic template
+    capabilities = ProviderCapabilities(max_batch_size=1000, server_side_templating=True, idempotency_keys=True,
+                                        stored_templates=True)
+    
+    def __init__(self, credentials: dict, pool_size: int = 10, retries: int = 2, prewarm: bool = False):
         super().__init__(credentials)
         self.api_key = credentials['api_key']
         self.base_url = 'https://api.sendgrid.com/v3'
+        self.session = pooled_session(
+            ('sendgrid', self.base_url, self.api_key), self.base_url,
+            pool_size=pool_size, retries=retries, prewarm=prewarm
+        )
     
-    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None) -> dict:
+    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
         try:
-            payload = {
-                'personalizations': [{'to': [{'email': to_email}]}],
-                'from': {'email': from_email},
-                'subject': subject,
-                'content': [
-                    {'type': 'text/plain', 'value': text_body or ''},
-                    {'type': 'text/html', 'value': html_body}
-                ]
-            }
+            payload = _build_payload(from_email, to_email, subject, html_body, text_body, idempotency_key)
             
-            response = requests.post(
+            response = self.session.post(
                 f'{self.base_url}/mail/send',
                 json=payload,
                 headers={'Authorization': f'Bearer {self.api_key}'},
@@ -29,13 +108,66 @@ class SendGridProvider(BaseProvider):
             if response.status_code == 202:
                 return {'success': True, 'message_id': response.headers.get('X-Message-Id')}
             else:
-                return {'success': False, 'error': response.text}
+                return {
+                    'success': False,
+                    'error': response.text,
+                    'throttled': response.status_code == 429,
+                    'transient': response.status_code in TRANSIENT_HTTP_STATUSES
+                }
+        except (requests.Timeout, requests.ConnectionError) as e:
+            return {'success': False, 'error': str(e), 'transient': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        """Send templated ``messages`` in one request; returns a result per message, in order.
+
+        If SendGrid rejects the request for any reason other than throttling
+        or a server error, usually one bad address, every message is sent on
+        its own so the rest still go out.
+        """
+        if template is None:
+            return super().send_batch(from_email, messages)
+        try:
+            payload = _build_batch_payload(from_email, template, messages)
+            
+            response = self.session.post(
+                f'{self.base_url}/mail/send',
+                json=payload,
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                timeout=60
+            )
+            
+            if response.status_code == 202:
+                message_id = response.headers.get('X-Message-Id')
+                return [{'success': True, 'message_id': message_id} for _ in messages]
+            if response.status_code in TRANSIENT_HTTP_STATUSES:
+                return batch_failure(response.status_code, response.text, len(messages))
+        except (requests.Timeout, requests.ConnectionError) as e:
+            return [{'success': False, 'error': str(e), 'transient': True} for _ in messages]
+        except Exception as e:
+            return [{'success': False, 'error': str(e)} for _ in messages]
+        
+        return [self.send(from_email=from_email, **render_batch_message(template, message)) for message in messages]
+    
+    def store_template(self, from_email: str, template: dict) -> str:
+        """Create a dynamic template for the campaign template; returns its id."""
+        name, version = _dynamic_template(template)
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+        
+        response = self.session.post(f'{self.base_url}/templates', json={'name': name, 'generation': 'dynamic'},
+                                     headers=headers, timeout=30)
+        response.raise_for_status()
+        template_id = response.json()['id']
+        
+        response = self.session.post(f'{self.base_url}/templates/{template_id}/versions',
+                                     json={'template_id': template_id, **version}, headers=headers, timeout=30)
+        response.raise_for_status()
+        return template_id
+    
     def verify(self) -> dict:
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.base_url}/user/profile',
                 headers={'Authorization': f'Bearer {self.api_key}'},
                 timeout=10
@@ -48,3 +180,89 @@ class SendGridProvider(BaseProvider):
     
     def get_rate_limit(self) -> int:
         return 100
+
+class AsyncSendGridProvider(AsyncBaseProvider):
+    capabilities = SendGridProvider.capabilities
+    
+    def __init__(self, credentials: dict):
+        super().__init__(credentials)
+        self.api_key = credentials['api_key']
+        self.base_url = 'https://api.sendgrid.com/v3'
+        self.client = None
+    
+    def _client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                timeout=30
+            )
+        return self.client
+    
+    async def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
+        try:
+            payload = _build_payload(from_email, to_email, subject, html_body, text_body, idempotency_key)
+            response = await self._client().post('/mail/send', json=payload)
+            
+            if response.status_code == 202:
+                return {'success': True, 'message_id': response.headers.get('X-Message-Id')}
+            else:
+                return {
+                    'success': False,
+                    'error': response.text,
+                    'throttled': response.status_code == 429,
+                    'transient': response.status_code in TRANSIENT_HTTP_STATUSES
+                }
+        except httpx.TransportError as e:
+            return {'success': False, 'error': str(e), 'transient': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    async def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        if template is None:
+            return await super().send_batch(from_email, messages)
+        try:
+            payload = _build_batch_payload(from_email, template, messages)
+            response = await self._client().post('/mail/send', json=payload, timeout=60)
+            
+            if response.status_code == 202:
+                message_id = response.headers.get('X-Message-Id')
+                return [{'success': True, 'message_id': message_id} for _ in messages]
+            if response.status_code in TRANSIENT_HTTP_STATUSES:
+                return batch_failure(response.status_code, response.text, len(messages))
+        except httpx.TransportError as e:
+            return [{'success': False, 'error': str(e), 'transient': True} for _ in messages]
+        except Exception as e:
+            return [{'success': False, 'error': str(e)} for _ in messages]
+        
+        return list(await asyncio.gather(*[
+            self.send(from_email=from_email, **render_batch_message(template, message)) for message in messages
+        ]))
+    
+    async def store_template(self, from_email: str, template: dict) -> str:
+        name, version = _dynamic_template(template)
+        response = await self._client().post('/templates', json={'name': name, 'generation': 'dynamic'})
+        response.raise_for_status()
+        template_id = response.json()['id']
+        
+        response = await self._client().post(f'/templates/{template_id}/versions',
+                                             json={'template_id': template_id, **version})
+        response.raise_for_status()
+        return template_id
+    
+    async def verify(self) -> dict:
+        try:
+            response = await self._client().get('/user/profile', timeout=10)
+            if response.status_code == 200:
+                return {'success': True}
+            return {'success': False, 'error': response.text}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_rate_limit(self) -> int:
+        return 100
+    
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
@@ -1,10 +1,47 @@
-from providers.base import BaseProvider
+from providers.base import BaseProvider, ProviderCapabilities, HANDLEBARS_TOKEN, render_batch_message, indexed_template, indexed_variables, template_name
 import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
+import json
+import threading
+import uuid
+
+TRANSIENT_ERROR_CODES = ('Throttling', 'ServiceUnavailable', 'InternalFailure', 'RequestTimeout')
+
+# Per-destination statuses of SendBulkTemplatedEmail worth retrying later
+TRANSIENT_DESTINATION_STATUSES = ('TransientFailure', 'Failed', 'AccountThrottled', 'TemplateDoesNotExist')
+
+def _stored_template(template: dict) -> tuple:
+    """The SES template for a campaign template: its name, parts and placeholders."""
+    subject, html_body, text_body, placeholders = indexed_template(
+        template['subject'], template['html_body'], template.get('text_body') or '', HANDLEBARS_TOKEN
+    )
+    parts = {'SubjectPart': subject, 'HtmlPart': html_body}
+    if text_body:
+        parts['TextPart'] = text_body
+    return template_name(template), parts, placeholders
+
+def _destination_result(status: dict) -> dict:
+    if status.get('Status') == 'Success':
+        return {'success': True, 'message_id': status.get('MessageId')}
+    return {
+        'success': False,
+        'error': status.get('Error') or status.get('Status'),
+        'throttled': status.get('Status') == 'AccountThrottled',
+        'transient': status.get('Status') in TRANSIENT_DESTINATION_STATUSES
+    }
 
 class SESProvider(BaseProvider):
+    # Up to 50 destinations per SendBulkTemplatedEmail call, rendered by SES
+    capabilities = ProviderCapabilities(max_batch_size=50, server_side_templating=True, idempotency_keys=True,
+                                        stored_templates=True)
+    
     def __init__(self, credentials: dict):
         super().__init__(credentials)
+        self._templates = set()
+        self._templates_lock = threading.Lock()
+        # Inline templates are named per instance so one run's close() never
+        # deletes a template another shard or campaign is still sending with
+        self._run_id = uuid.uuid4().hex[:8]
         self.client = boto3.client(
             'ses',
             aws_access_key_id=credentials['access_key_id'],
@@ -12,8 +49,10 @@ class SESProvider(BaseProvider):
             region_name=credentials.get('region', 'us-east-1')
         )
     
-    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None) -> dict:
+    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
         try:
+            # SendEmail cannot set custom headers; the key travels as a message tag instead
+            tags = [{'Name': 'idempotency_key', 'Value': idempotency_key}] if idempotency_key else []
             response = self.client.send_email(
                 Source=from_email,
                 Destination={'ToAddresses': [to_email]},
@@ -23,17 +62,125 @@ class SESProvider(BaseProvider):
                         'Text': {'Data': text_body or ''},
                         'Html': {'Data': html_body}
                     }
-                }
+                },
+                Tags=tags
             )
             
             return {'success': True, 'message_id': response['MessageId']}
         except ClientError as e:
-            return {'success': False, 'error': str(e)}
+            code = e.response.get('Error', {}).get('Code')
+            return {
+                'success': False,
+                'error': str(e),
+                'throttled': code == 'Throttling',
+                'transient': code in TRANSIENT_ERROR_CODES
+            }
+        except BotoCoreError as e:
+            # Endpoint unreachable, connection or read timeout
+            return {'success': False, 'error': str(e), 'transient': True}
+    
+    def _create(self, name: str, parts: dict):
+        try:
+            self.client.create_template(Template={'TemplateName': name, **parts})
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'AlreadyExists':
+                raise
+    
+    def _register(self, name: str, parts: dict):
+        """Create the SES template once per provider instance; close() deletes it."""
+        with self._templates_lock:
+            if name not in self._templates:
+                self._create(name, parts)
+                self._templates.add(name)
+    
+    def store_template(self, from_email: str, template: dict) -> str:
+        """Create the SES template and keep it; close() leaves it for later campaigns."""
+        name, parts, _ = _stored_template(template)
+        self._create(name, parts)
+        return name
+    
+    def send_batch(self, from_email: str, messages: list, template: dict = None) -> list:
+        """Send templated ``messages`` with SendBulkTemplatedEmail; returns a result per message, in order.
+
+        The campaign template is stored in SES once and rendered there from
+        each destination's replacement data; a ``template_id`` from
+        ``store_template`` is used as is. SES reports a status per
+        destination. If the template cannot be stored or the call is
+        rejected as a whole, every message is sent on its own.
+        """
+        if template is None:
+            return super().send_batch(from_email, messages)
+        name, parts, placeholders = _stored_template(template)
+        name = f'{name}-{self._run_id}'
+        stored = template.get('template_id')
+        
+        def missing():
+            # Deleted by hand while in use; create it again for the retry
+            if stored:
+                self._create(stored, parts)
+            else:
+                self._templates.discard(name)
+        
+        destinations = []
+        for message in messages:
+            destination = {
+                'Destination': {'ToAddresses': [message['to_email']]},
+                'ReplacementTemplateData': json.dumps(indexed_variables(placeholders, message.get('variables') or {}))
+            }
+            if message.get('idempotency_key'):
+                destination['ReplacementTags'] = [{'Name': 'idempotency_key', 'Value': message['idempotency_key']}]
+            destinations.append(destination)
+        
+        for attempt in range(2):
+            try:
+                if not stored:
+                    self._register(name, parts)
+                response = self.client.send_bulk_templated_email(
+                    Source=from_email,
+                    Template=stored or name,
+                    DefaultTemplateData='{}',
+                    Destinations=destinations
+                )
+                statuses = response['Status']
+                if any(status.get('Status') == 'TemplateDoesNotExist' for status in statuses):
+                    missing()
+                return [_destination_result(status) for status in statuses]
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code == 'TemplateDoesNotExist' and attempt == 0:
+                    try:
+                        missing()
+                    except ClientError:
+                        break
+                    continue
+                if code in TRANSIENT_ERROR_CODES:
+                    return [{'success': False, 'error': str(e), 'throttled': code == 'Throttling', 'transient': True}
+                            for _ in messages]
+                break
+            except BotoCoreError as e:
+                return [{'success': False, 'error': str(e), 'transient': True} for _ in messages]
+        
+        return [self.send(from_email=from_email, **render_batch_message(template, message)) for message in messages]
+    
+    def close(self):
+        """Delete the inline templates this instance created; no other run uses them."""
+        with self._templates_lock:
+            for name in self._templates:
+                try:
+                    self.client.delete_template(TemplateName=name)
+                except (ClientError, BotoCoreError):
+                    pass
+            self._templates.clear()
     
     def verify(self) -> dict:
         try:
             response = self.client.get_send_quota()
-            return {'success': True, 'quota': response}
+            return {
+                'success': True,
+                'quota': response,
+                # Discovered limit; the verify route stores it on the connection
+                'rate_limit': {'rate': max(1, int(response['MaxSendRate'])), 'per': 'second'}
+            }
         except ClientError as e:
             return {'success': False, 'error': str(e)}
     
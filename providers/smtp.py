@@ -1,35 +1,185 @@
-from providers.base import BaseProvider
+from providers.base import BaseProvider, AsyncBaseProvider, ProviderCapabilities, IDEMPOTENCY_HEADER
+from collections import deque
 import smtplib
 import ssl
+import threading
+import time
+import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+# "Service not available" / "try again later": the server wants us to slow down
+THROTTLE_SMTP_CODES = (421, 451)
+
+def _build_message(from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> MIMEMultipart:
+    message = MIMEMultipart('alternative')
+    message['From'] = from_email
+    message['To'] = to_email
+    message['Subject'] = subject
+    if idempotency_key:
+        # A stable Message-ID lets receiving servers drop a resent duplicate
+        message['Message-ID'] = f"<{idempotency_key}@{from_email.rsplit('@', 1)[-1]}>"
+        message[IDEMPOTENCY_HEADER] = idempotency_key
+    
+    if text_body:
+        message.attach(MIMEText(text_body, 'plain'))
+    message.attach(MIMEText(html_body, 'html'))
+    return message
+
+class SMTPConnectionPool:
+    """Authenticated SMTP sessions shared by every SMTPProvider for one (host, port, username).
+
+    A send borrows an idle session (the most recently used one first),
+    clears it with RSET and hands it back afterwards, so STARTTLS and AUTH
+    happen once per connection instead of once per message. Sessions are
+    closed after ``max_messages`` messages or ``idle_timeout`` idle seconds,
+    and at most ``size`` are kept idle. A reused session that turns out to be
+    dead (disconnect or 421) is dropped and the send retried on another; a
+    421 is still reported so the caller can slow down.
+    """
+    _pools = {}
+    _lock = threading.Lock()
+    
+    def __init__(self, host: str, port: int, username: str, password: str, size: int = 4,
+                 max_messages: int = 100, idle_timeout: float = 30, timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def get(cls, host: str, port: int, username: str, password: str, **options) -> 'SMTPConnectionPool':
+        key = (host, int(port), username)
+        with cls._lock:
+            pool = cls._pools.get(key)
+            if pool is None or pool.password != password:
+                if pool is not None:
+                    pool.close()
+                pool = cls._pools[key] = cls(host, int(port), username, password, **options)
+            else:
+                for name, value in options.items():
+                    setattr(pool, name, value)
+            return pool
+    
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.starttls(context=ssl.create_default_context())
+            server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def _acquire(self):
+        """Return (server, messages already sent on it, whether it was reused)."""
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                server, sent, last_used = self._idle.pop()
+                if now - last_used <= self.idle_timeout:
+                    return server, sent, True
+                server.close()
+        return self._connect(), 0, False
+    
+    def _release(self, server: smtplib.SMTP, sent: int):
+        if sent < self.max_messages:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append((server, sent, time.monotonic()))
+                    return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+    
+    def send(self, from_email: str, to_addrs, message: str) -> bool:
+        """Send ``message``; returns True if the server answered 421 on the way."""
+        throttled = False
+        while True:
+            server, sent, reused = self._acquire()
+            try:
+                if reused:
+                    code, _ = server.rset()
+                    if code != 250:
+                        raise smtplib.SMTPServerDisconnected(f'RSET failed with {code}')
+                server.sendmail(from_email, to_addrs, message)
+            except smtplib.SMTPRecipientsRefused:
+                # sendmail already reset the session; it is still usable
+                self._release(server, sent)
+                raise
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code != 421:
+                    self._release(server, sent)
+                    raise
+                server.close()
+                if reused:
+                    throttled = True
+                    continue
+                raise
+            except smtplib.SMTPServerDisconnected:
+                server.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                server.close()
+                raise
+            
+            self._release(server, sent + 1)
+            return throttled
+    
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for server, _, _ in idle:
+            server.close()
+
 class SMTPProvider(BaseProvider):
-    def __init__(self, credentials: dict):
+    capabilities = ProviderCapabilities(idempotency_keys=True)
+    
+    def __init__(self, credentials: dict, pool_size: int = 4, max_messages: int = 100, idle_timeout: float = 30):
         super().__init__(credentials)
         self.host = credentials['host']
         self.port = credentials['port']
         self.username = credentials['username']
         self.password = credentials['password']
+        self.pool = SMTPConnectionPool.get(
+            self.host, self.port, self.username, self.password,
+            size=pool_size, max_messages=max_messages, idle_timeout=idle_timeout
+        )
     
-    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None) -> dict:
+    def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
         try:
-            message = MIMEMultipart('alternative')
-            message['From'] = from_email
-            message['To'] = to_email
-            message['Subject'] = subject
-            
-            if text_body:
-                message.attach(MIMEText(text_body, 'plain'))
-            message.attach(MIMEText(html_body, 'html'))
-            
-            context = ssl.create_default_context()
-            with smtplib.SMTP(self.host, self.port, timeout=60) as server:
-                server.starttls(context=context)
-                server.login(self.username, self.password)
-                server.sendmail(from_email, to_email, message.as_string())
+            message = _build_message(from_email, to_email, subject, html_body, text_body, idempotency_key)
+            if self.pool.send(from_email, to_email, message.as_string()):
+                # Sent after a 421; still a signal for AdaptiveRate to back off
+                return {'success': True, 'throttled': True}
             
             return {'success': True}
+        except smtplib.SMTPResponseException as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'throttled': e.smtp_code in THROTTLE_SMTP_CODES,
+                'transient': 400 <= e.smtp_code < 500
+            }
+        except smtplib.SMTPRecipientsRefused as e:
+            codes = [code for code, _ in e.recipients.values()]
+            return {'success': False, 'error': str(e), 'transient': all(400 <= code < 500 for code in codes)}
+        except smtplib.SMTPServerDisconnected as e:
+            return {'success': False, 'error': str(e), 'transient': True}
+        except smtplib.SMTPException as e:
+            return {'success': False, 'error': str(e)}
+        except OSError as e:
+            # Connection refused, reset or timed out
+            return {'success': False, 'error': str(e), 'transient': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -45,3 +195,61 @@ class SMTPProvider(BaseProvider):
     
     def get_rate_limit(self) -> int:
         return 100
+
+class AsyncSMTPProvider(AsyncBaseProvider):
+    capabilities = SMTPProvider.capabilities
+    
+    def __init__(self, credentials: dict):
+        super().__init__(credentials)
+        self.host = credentials['host']
+        self.port = int(credentials['port'])
+        self.username = credentials['username']
+        self.password = credentials['password']
+    
+    def _connection(self, timeout: int) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            start_tls=True,
+            tls_context=ssl.create_default_context(),
+            timeout=timeout
+        )
+    
+    async def send(self, from_email: str, to_email: str, subject: str, html_body: str, text_body: str = None, idempotency_key: str = None) -> dict:
+        try:
+            message = _build_message(from_email, to_email, subject, html_body, text_body, idempotency_key)
+            
+            async with self._connection(timeout=60) as server:
+                await server.login(self.username, self.password)
+                await server.sendmail(from_email, [to_email], message.as_string())
+            
+            return {'success': True}
+        except aiosmtplib.SMTPRecipientsRefused as e:
+            codes = [error.code for error in e.recipients]
+            return {'success': False, 'error': str(e), 'transient': all(400 <= code < 500 for code in codes)}
+        except aiosmtplib.SMTPResponseException as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'throttled': e.code in THROTTLE_SMTP_CODES,
+                'transient': 400 <= e.code < 500
+            }
+        except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError) as e:
+            return {'success': False, 'error': str(e), 'transient': True}
+        except aiosmtplib.SMTPException as e:
+            return {'success': False, 'error': str(e)}
+        except OSError as e:
+            return {'success': False, 'error': str(e), 'transient': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    async def verify(self) -> dict:
+        try:
+            async with self._connection(timeout=30) as server:
+                await server.login(self.username, self.password)
+            return {'success': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_rate_limit(self) -> int:
+        return 100
@@ -1,8 +1,10 @@
-from flask import Blueprint, request, jsonify, session, redirect, url_for, render_template
+from flask import Blueprint, request, jsonify, session, redirect, url_for, render_template, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db
 from models.user import User
+from utils.rate_limiter import RateLimiter
+import math
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -18,6 +20,16 @@ def login():
     if not email or not password:
         return jsonify({'error': 'Email and password required'}), 400
     
+    limiter = RateLimiter.default()
+    key = f'login:{request.remote_addr}:{email.lower()}'
+    limit = current_app.config.get('LOGIN_ATTEMPTS_LIMIT', 10)
+    window = current_app.config.get('LOGIN_ATTEMPTS_WINDOW', 300)
+    if not limiter.check_limit(key, limit, window):
+        retry_after = math.ceil(limiter.get_wait_time(key, limit, window))
+        response = jsonify({'error': f'Too many login attempts. Try again in {retry_after} seconds.'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+    
     user = User.query.filter_by(email=email).first()
     if not user:
         return jsonify({'error': 'Invalid credentials'}), 401
@@ -1,8 +1,8 @@
-from flask import Blueprint, request, jsonify, render_template, current_app
+from flask import Blueprint, Response, request, jsonify, render_template, current_app, url_for
 from flask_login import login_required, current_user
 from models import db
 from models.campaign import Campaign, CampaignLog
-from utils.validators import check_spam_score
+from utils.validators import check_spam_score, parse_schedule_time
 
 campaigns_bp = Blueprint('campaigns', __name__)
 
@@ -33,7 +33,6 @@ def validate_wizard():
     from models.recipient_list import RecipientList
     from models.template import EmailTemplate
     from models.suppression import SuppressionList
-    from utils.validators import check_spam_score
     from datetime import date
     
     data = request.json
@@ -96,9 +95,30 @@ def list_campaigns():
         'total_recipients': c.total_recipients,
         'sent_count': c.sent_count,
         'failed_count': c.failed_count,
+        'scheduled_at': c.scheduled_at.isoformat() if c.scheduled_at else None,
         'created_at': c.created_at.isoformat()
     } for c in campaigns])
 
+def verified_provider_pool(provider_ids) -> list:
+    """Failover providers for a campaign; every id must be one of the user's verified connections."""
+    from models.provider import ProviderConnection
+    
+    if not provider_ids:
+        return None
+    
+    if not isinstance(provider_ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in provider_ids):
+        raise ValueError('provider_pool must be a list of provider ids')
+    
+    ids = provider_ids
+    found = ProviderConnection.query.filter(
+        ProviderConnection.id.in_(ids),
+        ProviderConnection.user_id == current_user.id,
+        ProviderConnection.is_verified.is_(True)
+    ).count()
+    if found != len(set(ids)):
+        raise ValueError('Provider pool must only contain your verified providers')
+    return ids
+
 @campaigns_bp.route('/create', methods=['POST'])
 @login_required
 def create_campaign():
@@ -111,9 +131,22 @@ def create_campaign():
     if not recipient_list:
         return jsonify({'error': 'List not found'}), 404
     
+    scheduled_at = None
+    if data.get('scheduled_at'):
+        try:
+            scheduled_at = parse_schedule_time(data['scheduled_at'])
+        except ValueError:
+            return jsonify({'error': 'scheduled_at must be an ISO 8601 date and time'}), 400
+    
+    try:
+        provider_pool = verified_provider_pool(data.get('provider_pool'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     campaign = Campaign(
         user_id=current_user.id,
         provider_id=data['provider_id'],
+        provider_pool=provider_pool,
         list_id=data['list_id'],
         template_id=data.get('template_id'),
         name=data['name'],
@@ -121,7 +154,8 @@ def create_campaign():
         html_body=data.get('html_body'),
         text_body=data.get('text_body'),
         total_recipients=recipient_list.recipient_count,
-        scheduled_at=data.get('scheduled_at')
+        scheduled_at=scheduled_at,
+        status='scheduled' if scheduled_at else 'draft'
     )
     
     db.session.add(campaign)
@@ -132,23 +166,23 @@ def create_campaign():
     
     db.session.commit()
     
+    if scheduled_at:
+        from services.scheduler import CampaignScheduler
+        CampaignScheduler.schedule(campaign.id)
+    
     return jsonify({'success': True, 'id': campaign.id})
 
 @campaigns_bp.route('/send-now', methods=['POST'])
 @login_required
 def send_now():
-    """Send campaign immediately without queuing"""
+    """Create a campaign and start sending it in the background right away"""
     from models.provider import ProviderConnection
-    from models.recipient_list import RecipientList, Recipient
+    from models.recipient_list import RecipientList
     from models.template import EmailTemplate
-    from services.provider_factory import ProviderFactory
-    from services.template_engine import TemplateEngine
-    from utils.crypto import CredentialEncryption
-    from datetime import datetime, date
-    import json
+    from services.sending_queue import SendingQueue
+    from datetime import datetime
     
     data = request.json
-    variable_mapping = data.get('variable_mapping', {})
     
     # Get resources
     provider = ProviderConnection.query.filter_by(id=data['provider_id'], user_id=current_user.id).first()
@@ -163,113 +197,85 @@ def send_now():
     if not template:
         return jsonify({'error': 'Template not found'}), 404
     
+    try:
+        provider_pool = verified_provider_pool(data.get('provider_pool'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Create campaign record
     campaign = Campaign(
         user_id=current_user.id,
         provider_id=provider.id,
+        provider_pool=provider_pool,
         list_id=recipient_list.id,
         template_id=template.id,
         name=data['name'],
         subject=data['subject'],
         html_body=template.html_body,
         text_body=template.text_body,
+        variable_mapping=data.get('variable_mapping') or None,
         total_recipients=recipient_list.recipient_count,
-        status='sending',
+        status='queued',
         started_at=datetime.utcnow()
     )
     db.session.add(campaign)
     db.session.commit()
     
-    # Get provider instance
-    crypto = CredentialEncryption(current_app.config['ENCRYPTION_KEY'])
-    credentials = json.loads(crypto.decrypt(provider.encrypted_credentials))
-    provider_instance = ProviderFactory.create(provider.provider_type, credentials)
+    try:
+        job_id = SendingQueue.enqueue(campaign.id)
+    except Exception as e:
+        campaign.status = 'failed'
+        db.session.commit()
+        return jsonify({'error': str(e)}), 500
     
-    # Send emails
-    recipients = Recipient.query.filter_by(list_id=recipient_list.id).all()
-    sent = 0
-    failed = 0
+    return jsonify({
+        'success': True,
+        'campaign_id': campaign.id,
+        'job_id': job_id,
+        'progress_url': url_for('campaigns.progress', campaign_id=campaign.id),
+        'events_url': url_for('campaigns.events', campaign_id=campaign.id) if current_app.config.get('SSE_ENABLED') else None
+    }), 202
+
+@campaigns_bp.route('/transactional', methods=['POST'])
+@login_required
+def send_transactional():
+    """Send a single message right away, ahead of any bulk campaign traffic"""
+    from models.provider import ProviderConnection
+    from services.sending_queue import SendingQueue
+    from concurrent.futures import TimeoutError
+    from datetime import date
+    
+    data = request.json
+    
+    provider = ProviderConnection.query.filter_by(id=data.get('provider_id'), user_id=current_user.id).first()
+    if not provider or not provider.is_verified:
+        return jsonify({'error': 'Provider not found or not verified'}), 404
+    
+    if not data.get('to_email') or not data.get('subject'):
+        return jsonify({'error': 'to_email and subject are required'}), 400
     
-    for recipient in recipients:
-        try:
-            # Build variables dict based on mapping
-            variables = {}
-            
-            # Always include email
-            variables['email'] = recipient.email
-            
-            # Map variables based on configuration
-            for var_name, mapping in variable_mapping.items():
-                if mapping['type'] == 'field':
-                    # Get value from recipient data
-                    field_name = mapping['value']
-                    if field_name == 'email':
-                        variables[var_name] = recipient.email
-                    elif field_name == 'name':
-                        variables[var_name] = recipient.data.get('name', '') if recipient.data else ''
-                    elif recipient.data and field_name in recipient.data:
-                        variables[var_name] = recipient.data[field_name]
-                    else:
-                        variables[var_name] = ''
-                elif mapping['type'] == 'custom':
-                    # Use custom value
-                    variables[var_name] = mapping['value']
-            
-            subject = TemplateEngine.render(data['subject'], variables)
-            html_body = TemplateEngine.render(template.html_body, variables)
-            text_body = TemplateEngine.render(template.text_body, variables) if template.text_body else TemplateEngine.html_to_text(html_body)
-            
-            result = provider_instance.send(
-                from_email=provider.sender_email,
-                to_email=recipient.email,
-                subject=subject,
-                html_body=html_body,
-                text_body=text_body
-            )
-            
-            log = CampaignLog(
-                campaign_id=campaign.id,
-                recipient_email=recipient.email,
-                status='sent' if result['success'] else 'failed',
-                error_message=result.get('error')
-            )
-            db.session.add(log)
-            
-            if result['success']:
-                sent += 1
-            else:
-                failed += 1
-                
-        except Exception as e:
-            failed += 1
-            log = CampaignLog(
-                campaign_id=campaign.id,
-                recipient_email=recipient.email,
-                status='failed',
-                error_message=str(e)
-            )
-            db.session.add(log)
-    
-    # Update campaign
-    campaign.sent_count = sent
-    campaign.failed_count = failed
-    campaign.status = 'completed'
-    campaign.completed_at = datetime.utcnow()
-    
-    # Update user send count
     if current_user.last_send_date != date.today():
         current_user.daily_send_count = 0
         current_user.last_send_date = date.today()
-    current_user.daily_send_count += sent
+    if current_user.daily_send_count >= current_user.send_limit:
+        return jsonify({'error': 'Daily send limit exceeded'}), 400
     
+    try:
+        result = SendingQueue.send_transactional(
+            provider,
+            to_email=data['to_email'],
+            subject=data['subject'],
+            html_body=data.get('html_body') or '',
+            text_body=data.get('text_body')
+        )
+    except TimeoutError:
+        return jsonify({'success': False, 'error': 'Provider did not respond in time'}), 504
+    
+    if result.get('success'):
+        current_user.daily_send_count += 1
     db.session.commit()
     
-    return jsonify({
-        'success': True,
-        'campaign_id': campaign.id,
-        'sent': sent,
-        'failed': failed
-    })
+    return jsonify(result), 200 if result.get('success') else 502
 
 @campaigns_bp.route('/<int:campaign_id>/send', methods=['POST'])
 @login_required
@@ -281,7 +287,7 @@ def send(campaign_id):
     if not campaign:
         return jsonify({'error': 'Not found'}), 404
     
-    if campaign.status not in ['draft', 'failed']:
+    if campaign.status not in ['draft', 'scheduled', 'failed']:
         return jsonify({'error': 'Campaign already sent or in progress'}), 400
     
     if current_user.last_send_date == date.today():
@@ -293,13 +299,66 @@ def send(campaign_id):
     db.session.commit()
     
     try:
-        SendingQueue.enqueue(campaign.id)
-        return jsonify({'success': True, 'message': 'Campaign queued for sending'})
+        job_id = SendingQueue.enqueue(campaign.id)
+        return jsonify({'success': True, 'message': 'Campaign queued for sending', 'job_id': job_id})
     except Exception as e:
         campaign.status = 'failed'
         db.session.commit()
         return jsonify({'error': str(e)}), 500
 
+@campaigns_bp.route('/<int:campaign_id>/resume', methods=['POST'])
+@login_required
+def resume(campaign_id):
+    """Continue a paused, failed or orphaned campaign from its last checkpoint"""
+    from services.sending_queue import SendingQueue
+    
+    campaign = Campaign.query.filter_by(id=campaign_id, user_id=current_user.id).first()
+    if not campaign:
+        return jsonify({'error': 'Not found'}), 404
+    
+    if campaign.status not in ['paused', 'failed', 'sending']:
+        return jsonify({'error': f'Cannot resume a campaign that is {campaign.status}'}), 400
+    
+    job_id = SendingQueue.resume(campaign.id)
+    if not job_id:
+        return jsonify({'error': 'Campaign is still being sent by a worker; try again once it stops'}), 409
+    return jsonify({
+        'success': True,
+        'message': 'Campaign resumed',
+        'job_id': job_id,
+        'last_recipient_id': campaign.last_recipient_id
+    })
+
+@campaigns_bp.route('/<int:campaign_id>/pause', methods=['POST'])
+@login_required
+def pause(campaign_id):
+    """Stop sending after in-flight messages finish; resume picks up from the checkpoint"""
+    from services.sending_queue import SendingQueue
+    
+    campaign = Campaign.query.filter_by(id=campaign_id, user_id=current_user.id).first()
+    if not campaign:
+        return jsonify({'error': 'Not found'}), 404
+    
+    if not SendingQueue.pause(campaign.id):
+        return jsonify({'error': f'Cannot pause a campaign that is {campaign.status}'}), 400
+    
+    return jsonify({'success': True, 'message': 'Campaign paused'})
+
+@campaigns_bp.route('/<int:campaign_id>/cancel', methods=['POST'])
+@login_required
+def cancel(campaign_id):
+    """Stop a campaign for good; recipients not yet sent to are skipped"""
+    from services.sending_queue import SendingQueue
+    
+    campaign = Campaign.query.filter_by(id=campaign_id, user_id=current_user.id).first()
+    if not campaign:
+        return jsonify({'error': 'Not found'}), 404
+    
+    if not SendingQueue.cancel(campaign.id):
+        return jsonify({'error': f'Cannot cancel a campaign that is {campaign.status}'}), 400
+    
+    return jsonify({'success': True, 'message': 'Campaign cancelled'})
+
 @campaigns_bp.route('/<int:campaign_id>')
 @login_required
 def get_campaign(campaign_id):
@@ -312,14 +371,109 @@ def get_campaign(campaign_id):
         'name': campaign.name,
         'subject': campaign.subject,
         'status': campaign.status,
+        'provider_id': campaign.provider_id,
+        'provider_pool': campaign.provider_pool or [],
         'total_recipients': campaign.total_recipients,
         'sent_count': campaign.sent_count,
         'failed_count': campaign.failed_count,
         'created_at': campaign.created_at.isoformat() if campaign.created_at else None,
+        'scheduled_at': campaign.scheduled_at.isoformat() if campaign.scheduled_at else None,
         'started_at': campaign.started_at.isoformat() if campaign.started_at else None,
         'completed_at': campaign.completed_at.isoformat() if campaign.completed_at else None
     })
 
+@campaigns_bp.route('/<int:campaign_id>/progress')
+@login_required
+def progress(campaign_id):
+    """Campaign progress and the per-recipient results logged after ``after``, for short polling"""
+    campaign = Campaign.query.filter_by(id=campaign_id, user_id=current_user.id).first()
+    if not campaign:
+        return jsonify({'error': 'Not found'}), 404
+    
+    after = request.args.get('after', 0, type=int)
+    logs = db.session.query(
+        CampaignLog.id, CampaignLog.recipient_email, CampaignLog.status, CampaignLog.error_message
+    ).filter(
+        CampaignLog.campaign_id == campaign_id,
+        CampaignLog.id > after
+    ).order_by(CampaignLog.id).limit(500).all()
+    
+    return jsonify({
+        'status': campaign.status,
+        'sent': campaign.sent_count or 0,
+        'failed': campaign.failed_count or 0,
+        'total': campaign.total_recipients,
+        'done': campaign.status in ['completed', 'failed', 'paused', 'cancelled'] and len(logs) < 500,
+        'after': logs[-1].id if logs else after,
+        'results': [{'email': log.recipient_email, 'status': log.status, 'error': log.error_message} for log in logs]
+    })
+
+@campaigns_bp.route('/<int:campaign_id>/events')
+@login_required
+def events(campaign_id):
+    """Server-Sent Events stream of campaign progress and per-recipient results"""
+    import json
+    import time
+    
+    campaign = Campaign.query.filter_by(id=campaign_id, user_id=current_user.id).first()
+    if not campaign:
+        return jsonify({'error': 'Not found'}), 404
+    
+    if not current_app.config.get('SSE_ENABLED'):
+        return jsonify({'error': 'Live streams are disabled; poll the progress URL instead',
+                        'progress_url': url_for('campaigns.progress', campaign_id=campaign_id)}), 404
+    
+    app = current_app._get_current_object()
+    last_id = request.headers.get('Last-Event-ID', type=int) or request.args.get('after', 0, type=int)
+    poll_interval = app.config.get('SSE_POLL_INTERVAL', 0.5)
+    # Capped so a stream never outlives the web worker timeout; EventSource
+    # reconnects with Last-Event-ID and carries on where it stopped
+    max_seconds = app.config.get('SSE_MAX_SECONDS', 60)
+    
+    def stream():
+        nonlocal last_id
+        deadline = time.monotonic() + max_seconds
+        progress = None
+        
+        yield 'retry: 1000\n\n'
+        
+        with app.app_context():
+            while time.monotonic() < deadline:
+                logs = db.session.query(
+                    CampaignLog.id, CampaignLog.recipient_email, CampaignLog.status, CampaignLog.error_message
+                ).filter(
+                    CampaignLog.campaign_id == campaign_id,
+                    CampaignLog.id > last_id
+                ).order_by(CampaignLog.id).limit(500).all()
+                
+                for log in logs:
+                    last_id = log.id
+                    result = {'email': log.recipient_email, 'status': log.status, 'error': log.error_message}
+                    yield f'id: {log.id}\nevent: result\ndata: {json.dumps(result)}\n\n'
+                
+                row = db.session.query(
+                    Campaign.status, Campaign.sent_count, Campaign.failed_count, Campaign.total_recipients
+                ).filter_by(id=campaign_id).first()
+                db.session.rollback()
+                
+                current = {'status': row.status, 'sent': row.sent_count or 0, 'failed': row.failed_count or 0, 'total': row.total_recipients}
+                if current != progress:
+                    progress = current
+                    yield f'event: progress\ndata: {json.dumps(current)}\n\n'
+                
+                if row.status in ['completed', 'failed', 'paused', 'cancelled'] and not logs:
+                    yield f'event: done\ndata: {json.dumps(current)}\n\n'
+                    return
+                
+                if not logs:
+                    yield ': keepalive\n\n'
+                    time.sleep(poll_interval)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @campaigns_bp.route('/<int:campaign_id>/logs')
 @login_required
 def get_logs(campaign_id):
@@ -335,3 +489,55 @@ def get_logs(campaign_id):
         'error_message': l.error_message,
         'sent_at': l.sent_at.isoformat()
     } for l in logs])
+
+@campaigns_bp.route('/<int:campaign_id>/dead-letters')
+@login_required
+def get_dead_letters(campaign_id):
+    """Recipients whose transient failures outlasted every retry"""
+    from models.dead_letter import DeadLetter
+    
+    campaign = Campaign.query.filter_by(id=campaign_id, user_id=current_user.id).first()
+    if not campaign:
+        return jsonify({'error': 'Not found'}), 404
+    
+    query = DeadLetter.query.filter_by(campaign_id=campaign_id)
+    if not request.args.get('include_replayed', type=int):
+        query = query.filter(DeadLetter.replayed_at.is_(None))
+    dead_letters = query.order_by(DeadLetter.id.desc()).limit(request.args.get('limit', 100, type=int)).all()
+    
+    return jsonify({
+        'pending': DeadLetter.query.filter_by(campaign_id=campaign_id, replayed_at=None).count(),
+        'dead_letters': [{
+            'id': d.id,
+            'recipient_email': d.recipient_email,
+            'error_message': d.error_message,
+            'attempts': d.attempts,
+            'created_at': d.created_at.isoformat(),
+            'replayed_at': d.replayed_at.isoformat() if d.replayed_at else None
+        } for d in dead_letters]
+    })
+
+@campaigns_bp.route('/<int:campaign_id>/dead-letters/replay', methods=['POST'])
+@login_required
+def replay_dead_letters(campaign_id):
+    """Resend every dead-lettered recipient of a completed campaign"""
+    from models.dead_letter import DeadLetter
+    from services.sending_queue import SendingQueue
+    
+    campaign = Campaign.query.filter_by(id=campaign_id, user_id=current_user.id).first()
+    if not campaign:
+        return jsonify({'error': 'Not found'}), 404
+    
+    if campaign.status == 'failed':
+        return jsonify({'error': 'Resume the failed campaign first; dead letters can be replayed once it completes'}), 400
+    if campaign.status != 'completed':
+        return jsonify({'error': f'Cannot replay while the campaign is {campaign.status}'}), 400
+    
+    count = DeadLetter.query.filter_by(campaign_id=campaign_id, replayed_at=None).count()
+    if not count:
+        return jsonify({'error': 'No dead letters to replay'}), 400
+    
+    job_id = SendingQueue.replay_dead_letters(campaign.id)
+    if not job_id:
+        return jsonify({'error': 'Campaign is no longer completed'}), 409
+    return jsonify({'success': True, 'job_id': job_id, 'replaying': count})
@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from models import db
 from models.provider import ProviderConnection
 from utils.crypto import CredentialEncryption
+from utils.token_bucket import TokenBucket
 from flask import current_app
 import json
 
@@ -94,6 +95,11 @@ def verify_provider(provider_id):
             provider.verification_status = 'verified'
             provider.health_status = 'healthy'
             provider.last_verified_at = datetime.utcnow()
+            
+            # Providers that report their own quota (SES MaxSendRate) set the pacing ceiling
+            if result.get('rate_limit'):
+                provider.rate_limit = result['rate_limit']['rate']
+                provider.rate_period = result['rate_limit']['per']
         else:
             provider.verification_status = 'invalid_credentials'
             provider.health_status = 'error'
@@ -123,7 +129,44 @@ def get_provider(provider_id):
         'sender_email': provider.sender_email,
         'sender_name': provider.sender_name,
         'credentials': credentials,
-        'rate_limit': provider.rate_limit
+        'rate_limit': provider.rate_limit,
+        'rate_period': provider.rate_period,
+        'burst': provider.burst
+    })
+
+@providers_bp.route('/<int:provider_id>/lanes')
+@login_required
+def get_lanes(provider_id):
+    """Transactional and bulk sends through this provider.
+
+    ``rate`` and ``used`` come from the shared rate limiter and so cover every
+    worker; latency figures are only for sends made by this process.
+    """
+    from services.send_pool import SendPool, TRANSACTIONAL, BULK
+    from services.async_engine import AsyncSendPool
+    from utils.rate_limiter import RateLimiter
+    
+    provider = ProviderConnection.query.filter_by(id=provider_id, user_id=current_user.id).first()
+    if not provider:
+        return jsonify({'error': 'Not found'}), 404
+    
+    engine = AsyncSendPool if current_app.config.get('SEND_ENGINE') == 'asyncio' else SendPool
+    pool = engine._pools.get(provider.id)
+    quotas = SendPool.lane_quotas(provider)
+    
+    lanes = {}
+    for lane in [TRANSACTIONAL, BULK]:
+        stats = pool.metrics[lane].snapshot() if pool else {}
+        if quotas:
+            key, limit, window, _ = quotas[lane][0]
+            stats['rate'] = limit if lane == BULK else limit - quotas[BULK][0][1]
+            stats['used'] = round(RateLimiter.default().usage(key, window), 1)
+        lanes[lane] = stats
+    
+    return jsonify({
+        'concurrency': pool.concurrency if pool else None,
+        'reserved': pool.reserved if pool else None,
+        'lanes': lanes
     })
 
 @providers_bp.route('/<int:provider_id>/update', methods=['POST'])
@@ -143,6 +186,12 @@ def update_provider(provider_id):
         provider.sender_name = data['sender_name']
     if 'rate_limit' in data:
         provider.rate_limit = data['rate_limit']
+    if 'rate_period' in data:
+        if data['rate_period'] not in TokenBucket.PERIODS:
+            return jsonify({'error': f"Invalid rate period: {data['rate_period']}"}), 400
+        provider.rate_period = data['rate_period']
+    if 'burst' in data:
+        provider.burst = data['burst'] or None
     
     # Update credentials if provided
     if 'credentials' in data:
@@ -1,6 +1,7 @@
 import requests
 from flask import current_app
 from utils.crypto import CredentialEncryption
+from utils.rate_limiter import RateLimiter
 from datetime import datetime, timedelta
 
 class AIAssistant:
@@ -8,13 +9,7 @@ class AIAssistant:
     
     @staticmethod
     def check_rate_limit(user_id: int) -> bool:
-        from models import db
-        from models.user import User
-        
-        # Simple in-memory rate limiting (production should use Redis)
-        cache_key = f'ai_rate_limit_{user_id}'
-        # This is a placeholder - implement proper rate limiting
-        return True
+        return RateLimiter.default().check_limit(f'ai:{user_id}', AIAssistant.MAX_REQUESTS_PER_HOUR, 3600)
     
     @staticmethod
     def generate_email(provider: str, prompt: str, variables: list, user_id: int) -> dict:
@@ -0,0 +1,49 @@
+from services.send_pool import SendPool
+from services.provider_factory import ProviderFactory
+import asyncio
+import threading
+
+class EventLoopThread:
+    """A single asyncio loop running in a background thread for the whole process."""
+    _loop = None
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def get_loop() -> asyncio.AbstractEventLoop:
+        with EventLoopThread._lock:
+            if EventLoopThread._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='send-event-loop')
+                thread.daemon = True
+                thread.start()
+                EventLoopThread._loop = loop
+            return EventLoopThread._loop
+    
+    @staticmethod
+    def run(coro, timeout: float = None):
+        return asyncio.run_coroutine_threadsafe(coro, EventLoopThread.get_loop()).result(timeout)
+
+class AsyncSendPool(SendPool):
+    """SendPool that runs AsyncBaseProvider sends as coroutines on one event loop.
+
+    Because a send waiting on the network costs a coroutine rather than a
+    thread, the in-flight limit (ASYNC_PROVIDER_CONCURRENCY) can be in the
+    hundreds or thousands without extra cores.
+    """
+    _pools = {}
+    CONCURRENCY_SETTING = 'ASYNC_PROVIDER_CONCURRENCY'
+    
+    def _start(self, name: str):
+        self.loop = EventLoopThread.get_loop()
+    
+    def create_provider(self, provider_type: str, credentials: dict):
+        return ProviderFactory.create_async(provider_type, credentials, max_workers=min(self.concurrency, 32))
+    
+    def close_provider(self, provider_instance):
+        EventLoopThread.run(provider_instance.aclose(), timeout=30)
+    
+    def call(self, fn, *args):
+        return EventLoopThread.run(fn(*args), timeout=60)
+    
+    def _dispatch(self, fn, args, kwargs):
+        return asyncio.run_coroutine_threadsafe(fn(*args, **kwargs), self.loop)
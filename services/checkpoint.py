@@ -0,0 +1,42 @@
+from models import db
+from models.campaign import CampaignLog
+from collections import deque
+
+class CampaignCheckpoint:
+    """Tracks how far a campaign has durably progressed.
+
+    Sends complete out of order, so the cursor is a low-water mark: every
+    recipient with ``id <= last_recipient_id`` has a committed log row.
+    Recipients dispatched but not yet logged are reported as ``in_flight``.
+    ``state()`` must only be persisted in the same transaction that writes
+    the log rows for everything marked completed so far.
+    """
+    
+    def __init__(self, last_recipient_id: int = 0):
+        self.last_recipient_id = last_recipient_id or 0
+        self._dispatched = deque()
+        self._in_flight = set()
+    
+    def dispatched(self, recipient_id: int):
+        self._dispatched.append(recipient_id)
+        self._in_flight.add(recipient_id)
+    
+    def completed(self, recipient_id: int):
+        self._in_flight.discard(recipient_id)
+    
+    def state(self) -> dict:
+        while self._dispatched and self._dispatched[0] not in self._in_flight:
+            self.last_recipient_id = self._dispatched.popleft()
+        return {'last_recipient_id': self.last_recipient_id, 'in_flight': sorted(self._in_flight)}
+    
+    @staticmethod
+    def logged_after(campaign_id: int, last_recipient_id: int, until_id: int = None) -> set:
+        """Recipients past the cursor that already have a log row (completed out of order)."""
+        query = db.session.query(CampaignLog.recipient_id).filter(
+            CampaignLog.campaign_id == campaign_id,
+            CampaignLog.recipient_id > (last_recipient_id or 0)
+        )
+        if until_id is not None:
+            query = query.filter(CampaignLog.recipient_id <= until_id)
+        rows = query.all()
+        return {recipient_id for (recipient_id,) in rows}
@@ -0,0 +1,342 @@
+from models import db
+from models.job import Job, TenantShare
+from models.user import User
+from flask import current_app
+from sqlalchemy import or_, and_, func
+from datetime import datetime, timedelta
+import logging
+import os
+import random
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+class SQLJobBackend:
+    """Job queue stored in the application database (SQLite or Postgres).
+
+    Jobs are claimed with a conditional UPDATE so that only one worker wins a
+    given row. A claimed job is leased until ``locked_until``; if the worker
+    dies and stops heartbeating, the lease expires and the job becomes
+    claimable again (at-least-once delivery).
+    
+    Jobs that belong to a tenant (user) are claimed in weighted fair order:
+    the tenant with the lowest virtual time goes first, and a tenant already
+    running ``tenant_concurrency`` jobs waits while anyone else has work.
+    Jobs without a tenant are claimed ahead of all tenant work.
+    """
+    name = 'sql'
+    
+    def __init__(self, visibility_timeout: int, max_attempts: int, tenant_concurrency: int = 2):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.tenant_concurrency = tenant_concurrency
+    
+    def enqueue(self, kind: str, payload: dict, queue: str = 'default', delay: float = 0, tenant: int = None) -> str:
+        if tenant is not None:
+            self._activate(tenant)
+        job = Job(
+            queue=queue,
+            kind=kind,
+            payload=payload,
+            tenant_id=tenant,
+            max_attempts=self.max_attempts,
+            available_at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        db.session.add(job)
+        db.session.commit()
+        return str(job.id)
+    
+    def _activate(self, tenant: int):
+        """Bring an idle tenant's virtual time up to the busiest tenants' so it cannot bank credit."""
+        active = db.session.query(Job.tenant_id).filter(
+            Job.tenant_id.isnot(None),
+            Job.tenant_id != tenant,
+            Job.status.in_(['pending', 'running'])
+        )
+        floor = db.session.query(func.min(TenantShare.virtual_time)).filter(TenantShare.user_id.in_(active)).scalar()
+        
+        share = db.session.get(TenantShare, tenant)
+        if share is None:
+            share = TenantShare(user_id=tenant, virtual_time=0)
+            db.session.add(share)
+        share.virtual_time = max(share.virtual_time or 0, floor or 0)
+    
+    def charge(self, tenant: int, units: int):
+        """Advance a tenant's virtual time by ``units`` of work divided by its weight (User.send_limit)."""
+        if not units:
+            return
+        weight = db.session.query(User.send_limit).filter_by(id=tenant).scalar() or 1
+        updated = TenantShare.query.filter_by(user_id=tenant).update(
+            {'virtual_time': TenantShare.virtual_time + units / max(weight, 1)},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.add(TenantShare(user_id=tenant, virtual_time=units / max(weight, 1)))
+        db.session.commit()
+    
+    def waiting(self, queues: list) -> bool:
+        """Whether any job in ``queues`` is ready to be claimed."""
+        return db.session.query(
+            db.session.query(Job.id).filter(Job.queue.in_(queues), self._claimable(datetime.utcnow())).exists()
+        ).scalar()
+    
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(Job.status == 'pending', Job.available_at <= now),
+            and_(Job.status == 'running', Job.locked_until < now)
+        )
+    
+    def _candidates(self, queues: list, now: datetime) -> list:
+        """The oldest claimable job of each tenant, in fair claim order."""
+        heads = db.session.query(Job.tenant_id, func.min(Job.id)).filter(
+            Job.queue.in_(queues),
+            self._claimable(now)
+        ).group_by(Job.tenant_id).all()
+        
+        tenants = [tenant for tenant, _ in heads if tenant is not None]
+        running, shares = {}, {}
+        if tenants:
+            running = dict(db.session.query(Job.tenant_id, func.count(Job.id)).filter(
+                Job.tenant_id.in_(tenants),
+                Job.status == 'running',
+                Job.locked_until >= now
+            ).group_by(Job.tenant_id).all())
+            shares = dict(db.session.query(TenantShare.user_id, TenantShare.virtual_time).filter(
+                TenantShare.user_id.in_(tenants)
+            ).all())
+        
+        def order(head):
+            tenant, job_id = head
+            if tenant is None:
+                return (0, 0, 0, job_id)
+            return (1, running.get(tenant, 0) >= self.tenant_concurrency, shares.get(tenant, 0), job_id)
+        
+        return [job_id for _, job_id in sorted(heads, key=order)]
+    
+    def claim(self, worker_id: str, queues: list):
+        now = datetime.utcnow()
+        for job_id in self._candidates(queues, now):
+            claimed = Job.query.filter(Job.id == job_id, self._claimable(now)).update({
+                'status': 'running',
+                'locked_by': worker_id,
+                'locked_until': now + timedelta(seconds=self.visibility_timeout),
+                'attempts': Job.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            
+            if not claimed:
+                continue
+            
+            job = db.session.get(Job, job_id)
+            if job.attempts > job.max_attempts:
+                job.status = 'failed'
+                job.last_error = job.last_error or 'Visibility timeout expired too many times'
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+                continue
+            
+            return job
+        
+        return None
+    
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        extended = Job.query.filter_by(id=job_id, locked_by=worker_id, status='running').update({
+            'locked_until': datetime.utcnow() + timedelta(seconds=self.visibility_timeout)
+        }, synchronize_session=False)
+        db.session.commit()
+        return bool(extended)
+    
+    def ack(self, job_id: int, worker_id: str):
+        Job.query.filter_by(id=job_id, locked_by=worker_id).update({
+            'status': 'done',
+            'locked_until': None,
+            'finished_at': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+    
+    def fail(self, job_id: int, worker_id: str, error: str, retry_delay: float = 30):
+        job = Job.query.filter_by(id=job_id, locked_by=worker_id).first()
+        if not job:
+            return
+        
+        job.last_error = error
+        job.locked_until = None
+        if job.attempts < job.max_attempts:
+            job.status = 'pending'
+            job.available_at = datetime.utcnow() + timedelta(seconds=retry_delay * job.attempts)
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+class CeleryJobBackend:
+    """Job queue backed by the Celery broker configured in CELERY_BROKER_URL.
+
+    Tasks are acknowledged late and rejected on worker loss, so a job whose
+    worker dies is redelivered once the broker visibility timeout passes.
+    Jobs are routed to the ``default`` queue, which is also the worker's
+    default, so ``celery -A worker.celery worker`` consumes them.
+    """
+    name = 'celery'
+    
+    def __init__(self, broker_url: str, visibility_timeout: int, max_attempts: int):
+        from celery import Celery
+        from kombu import Queue
+        
+        self.max_attempts = max_attempts
+        self.celery = Celery('lapsli', broker=broker_url)
+        self.celery.conf.update(
+            task_acks_late=True,
+            task_reject_on_worker_lost=True,
+            worker_prefetch_multiplier=1,
+            task_default_queue='default',
+            task_queues=(Queue('default'),),
+            broker_transport_options={'visibility_timeout': visibility_timeout}
+        )
+        self.task = self.celery.task(name='lapsli.run_job', bind=True, max_retries=max_attempts)(_run_celery_job)
+    
+    def enqueue(self, kind: str, payload: dict, queue: str = 'default', delay: float = 0, tenant: int = None) -> str:
+        # Celery consumes in broker order; tenant fairness only applies to the SQL backend
+        result = self.task.apply_async(args=(kind, payload), queue=queue, countdown=delay or None)
+        return result.id
+
+def _run_celery_job(task, kind: str, payload: dict):
+    from app_production import app
+    
+    with app.app_context():
+        try:
+            JobQueue.run(kind, payload)
+        except Exception as e:
+            raise task.retry(exc=e, countdown=30 * (task.request.retries + 1))
+
+class JobQueue:
+    _backends = {}
+    
+    @staticmethod
+    def register(kind: str):
+        def decorator(func):
+            HANDLERS[kind] = func
+            return func
+        return decorator
+    
+    @staticmethod
+    def backend():
+        config = current_app.config
+        name = config.get('JOB_QUEUE_BACKEND', 'sql')
+        if name not in JobQueue._backends:
+            visibility_timeout = config.get('JOB_VISIBILITY_TIMEOUT', 300)
+            max_attempts = config.get('JOB_MAX_ATTEMPTS', 5)
+            if name == 'sql':
+                tenant_concurrency = config.get('TENANT_MAX_RUNNING_JOBS', 2)
+                JobQueue._backends[name] = SQLJobBackend(visibility_timeout, max_attempts, tenant_concurrency)
+            elif name == 'celery':
+                JobQueue._backends[name] = CeleryJobBackend(config['CELERY_BROKER_URL'], visibility_timeout, max_attempts)
+            else:
+                raise ValueError(f'Unknown job queue backend: {name}')
+        return JobQueue._backends[name]
+    
+    @staticmethod
+    def enqueue(kind: str, payload: dict, queue: str = 'default', delay: float = 0, tenant: int = None) -> str:
+        if kind not in HANDLERS:
+            raise ValueError(f'No handler registered for job: {kind}')
+        return JobQueue.backend().enqueue(kind, payload, queue=queue, delay=delay, tenant=tenant)
+    
+    @staticmethod
+    def charge(tenant: int, units: int):
+        """Record work done for a tenant so fair claiming can account for it."""
+        backend = JobQueue.backend()
+        if hasattr(backend, 'charge'):
+            backend.charge(tenant, units)
+    
+    @staticmethod
+    def has_waiting(queue: str = 'default') -> bool:
+        """Whether other jobs are ready to run; False when the backend cannot tell."""
+        backend = JobQueue.backend()
+        return hasattr(backend, 'waiting') and backend.waiting([queue])
+    
+    @staticmethod
+    def run(kind: str, payload: dict):
+        handler = HANDLERS.get(kind)
+        if not handler:
+            raise ValueError(f'No handler registered for job: {kind}')
+        return handler(**(payload or {}))
+
+class Worker:
+    """Polls the SQL job backend and runs claimed jobs.
+
+    Each of ``concurrency`` threads claims one job at a time and keeps its
+    lease alive with a heartbeat while the handler runs.
+    """
+    
+    def __init__(self, app, queues: list = None, concurrency: int = None, poll_interval: float = None):
+        self.app = app
+        self.queues = queues or ['default']
+        self.concurrency = concurrency or app.config.get('WORKER_CONCURRENCY', 2)
+        self.poll_interval = poll_interval or app.config.get('WORKER_POLL_INTERVAL', 1.0)
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._threads = []
+    
+    def start(self):
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, args=(f'{self.worker_id}:{i}',), name=f'job-worker-{i}')
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self):
+        self._stop.set()
+    
+    def join(self):
+        for thread in self._threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
+    
+    def _loop(self, worker_id: str):
+        with self.app.app_context():
+            backend = JobQueue.backend()
+            while not self._stop.is_set():
+                try:
+                    job = backend.claim(worker_id, self.queues)
+                except Exception as e:
+                    logger.exception('Failed to claim job: %s', e)
+                    db.session.rollback()
+                    job = None
+                
+                if not job:
+                    self._stop.wait(self.poll_interval * random.uniform(0.5, 1.5))
+                    continue
+                
+                self._execute(backend, job, worker_id)
+    
+    def _execute(self, backend, job: Job, worker_id: str):
+        job_id, kind, payload = job.id, job.kind, job.payload
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(backend, job_id, worker_id, done))
+        heartbeat.daemon = True
+        heartbeat.start()
+        
+        try:
+            JobQueue.run(kind, payload)
+            db.session.rollback()
+            backend.ack(job_id, worker_id)
+        except Exception as e:
+            logger.exception('Job %s (%s) failed', job_id, kind)
+            db.session.rollback()
+            backend.fail(job_id, worker_id, str(e))
+        finally:
+            done.set()
+    
+    def _heartbeat(self, backend, job_id: int, worker_id: str, done: threading.Event):
+        interval = max(backend.visibility_timeout / 3, 1)
+        with self.app.app_context():
+            while not done.wait(interval):
+                try:
+                    if not backend.heartbeat(job_id, worker_id):
+                        logger.warning('Lost lease on job %s', job_id)
+                        return
+                except Exception:
+                    db.session.rollback()
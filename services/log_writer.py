@@ -0,0 +1,114 @@
+from models import db
+from models.campaign import Campaign, CampaignLog, CampaignShard
+from models.dead_letter import DeadLetter
+from services.sent_ledger import SentLedger
+from flask import current_app
+from sqlalchemy import insert, func
+from datetime import datetime
+import time
+
+class CampaignLogWriter:
+    """Buffers CampaignLog rows and writes them with one bulk INSERT per flush.
+
+    A flush happens every ``batch_size`` rows or ``interval`` seconds, and
+    also bumps Campaign.sent_count/failed_count so progress is visible while
+    the campaign is still running. When a checkpoint is attached, its cursor
+    is saved in the same transaction as the rows it covers, on the shard's
+    row instead of the campaign's when ``shard_id`` is set. With ``replay``
+    set, results are for previously failed recipients, so a success moves
+    one from failed_count to sent_count and a failure changes neither.
+    Successful sends are also written to the sent ledger in the same
+    transaction.
+    """
+    
+    def __init__(self, campaign_id: int, batch_size: int = None, interval: float = None, checkpoint=None,
+                 replay: bool = False, shard_id: int = None):
+        self.campaign_id = campaign_id
+        self.shard_id = shard_id
+        self.checkpoint = checkpoint
+        self.replay = replay
+        self.batch_size = batch_size or current_app.config.get('LOG_FLUSH_ROWS', 500)
+        self.interval = interval or current_app.config.get('LOG_FLUSH_SECONDS', 2.0)
+        self.total_sent = 0
+        self.total_failed = 0
+        self._rows = []
+        self._dead_letters = []
+        self._ledger = []
+        self._sent = 0
+        self._failed = 0
+        self._last_flush = time.monotonic()
+    
+    def add(self, recipient_id: int, recipient_email: str, success: bool, error_message: str = None,
+            dead_letter_attempts: int = None, provider_id: int = None, message_id: str = None):
+        """Record a final result; ``dead_letter_attempts`` also files it in the dead-letter table."""
+        if dead_letter_attempts is not None:
+            self._dead_letters.append({
+                'campaign_id': self.campaign_id,
+                'recipient_id': recipient_id,
+                'recipient_email': recipient_email,
+                'error_message': error_message,
+                'attempts': dead_letter_attempts,
+                'created_at': datetime.utcnow()
+            })
+        
+        self._rows.append({
+            'campaign_id': self.campaign_id,
+            'recipient_id': recipient_id,
+            'recipient_email': recipient_email,
+            'status': 'sent' if success else 'failed',
+            'error_message': error_message,
+            'sent_at': datetime.utcnow()
+        })
+        
+        if success:
+            self._sent += 1
+            self._ledger.append({
+                'idempotency_key': SentLedger.key(self.campaign_id, recipient_id),
+                'campaign_id': self.campaign_id,
+                'recipient_id': recipient_id,
+                'provider_id': provider_id,
+                'message_id': message_id,
+                'sent_at': datetime.utcnow()
+            })
+        else:
+            self._failed += 1
+        
+        if self.checkpoint:
+            self.checkpoint.completed(recipient_id)
+        
+        if len(self._rows) >= self.batch_size or time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+    
+    def flush(self):
+        self._last_flush = time.monotonic()
+        values = {'heartbeat_at': datetime.utcnow()}
+        
+        if self._rows:
+            db.session.execute(insert(CampaignLog), self._rows)
+            values['sent_count'] = func.coalesce(Campaign.sent_count, 0) + self._sent
+            if self.replay:
+                values['failed_count'] = func.coalesce(Campaign.failed_count, 0) - self._sent
+            else:
+                values['failed_count'] = func.coalesce(Campaign.failed_count, 0) + self._failed
+        if self._dead_letters:
+            db.session.execute(insert(DeadLetter), self._dead_letters)
+        if self._ledger:
+            db.session.execute(SentLedger.insert_statement(), self._ledger)
+        
+        if self.checkpoint and self.shard_id:
+            CampaignShard.query.filter_by(id=self.shard_id).update(
+                dict(self.checkpoint.state(), heartbeat_at=values['heartbeat_at']), synchronize_session=False
+            )
+        elif self.checkpoint:
+            values.update(self.checkpoint.state())
+        
+        Campaign.query.filter_by(id=self.campaign_id).update(values, synchronize_session=False)
+        db.session.commit()
+        
+        self.total_sent += self._sent
+        self.total_failed += self._failed
+        self._rows = []
+        self._dead_letters = []
+        self._ledger = []
+        self._sent = 0
+        self._failed = 0
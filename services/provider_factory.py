@@ -4,24 +4,52 @@ from providers.sendgrid import SendGridProvider
 from providers.mailgun import MailgunProvider
 from providers.ses import SESProvider
 from providers.smtp import SMTPProvider
+from providers.base import ExecutorProviderAdapter, ProviderCapabilities
+from providers.sendgrid import AsyncSendGridProvider
+from providers.mailgun import AsyncMailgunProvider
+from providers.brevo import AsyncBrevoProvider
+from providers.smtp import AsyncSMTPProvider
 
 class ProviderFactory:
+    PROVIDERS = {
+        'gmail': GmailProvider,
+        'brevo': BrevoProvider,
+        'sendgrid': SendGridProvider,
+        'mailgun': MailgunProvider,
+        'ses': SESProvider,
+        'smtp': SMTPProvider
+    }
+    
+    @staticmethod
+    def create(provider_type: str, credentials: dict, **options):
+        """Create a provider; ``options`` tune its connection pooling (see SendPool.provider_options)."""
+        provider_class = ProviderFactory.PROVIDERS.get(provider_type)
+        if not provider_class:
+            raise ValueError(f'Unknown provider: {provider_type}')
+        
+        return provider_class(credentials, **options)
+    
+    @staticmethod
+    def capabilities(provider_type: str) -> ProviderCapabilities:
+        """Capabilities a provider type declares, without creating one."""
+        provider_class = ProviderFactory.PROVIDERS.get(provider_type)
+        return provider_class.capabilities if provider_class else ProviderCapabilities()
+    
     @staticmethod
-    def create(provider_type: str, credentials: dict):
+    def create_async(provider_type: str, credentials: dict, max_workers: int = 8):
+        """Create an awaitable provider; blocking SDKs (Gmail, SES) run in a thread pool."""
         providers = {
-            'gmail': GmailProvider,
-            'brevo': BrevoProvider,
-            'sendgrid': SendGridProvider,
-            'mailgun': MailgunProvider,
-            'ses': SESProvider,
-            'smtp': SMTPProvider
+            'brevo': AsyncBrevoProvider,
+            'sendgrid': AsyncSendGridProvider,
+            'mailgun': AsyncMailgunProvider,
+            'smtp': AsyncSMTPProvider
         }
         
         provider_class = providers.get(provider_type)
-        if not provider_class:
-            raise ValueError(f'Unknown provider: {provider_type}')
+        if provider_class:
+            return provider_class(credentials)
         
-        return provider_class(credentials)
+        return ExecutorProviderAdapter(ProviderFactory.create(provider_type, credentials), max_workers=max_workers)
     
     @staticmethod
     def get_credential_schema(provider_type: str) -> dict:
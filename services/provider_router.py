@@ -0,0 +1,119 @@
+from services.send_pool import send_result, send_results
+import random
+import threading
+import time
+
+class ProviderHealth:
+    """Rolling success rate and latency of one ProviderConnection in this process.
+
+    Both are exponentially weighted moving averages. After ``TRIP_AFTER``
+    consecutive failures the provider is skipped for ``COOLDOWN`` seconds,
+    then gets traffic again as soon as it is the best option left.
+    """
+    _stats = {}
+    _lock = threading.Lock()
+    ALPHA = 0.2
+    TRIP_AFTER = 5
+    COOLDOWN = 30
+    DEFAULT_LATENCY = 0.5
+    
+    def __init__(self):
+        self.success_rate = 1.0
+        self.latency = None
+        self.consecutive_failures = 0
+        self.open_until = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def for_provider(provider_id: int) -> 'ProviderHealth':
+        with ProviderHealth._lock:
+            health = ProviderHealth._stats.get(provider_id)
+            if health is None:
+                health = ProviderHealth._stats[provider_id] = ProviderHealth()
+            return health
+    
+    def record(self, success: bool, latency: float):
+        with self._lock:
+            self.success_rate += self.ALPHA * ((1.0 if success else 0.0) - self.success_rate)
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.ALPHA * (latency - self.latency)
+            
+            if success:
+                self.consecutive_failures = 0
+                self.open_until = 0
+            else:
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= self.TRIP_AFTER:
+                    self.open_until = time.monotonic() + self.COOLDOWN
+    
+    def available(self) -> bool:
+        return time.monotonic() >= self.open_until
+    
+    def score(self) -> float:
+        """Higher is better: health counts twice as much as speed."""
+        latency = self.latency if self.latency is not None else self.DEFAULT_LATENCY
+        return self.success_rate ** 2 / max(latency, 0.01)
+
+class RouteMember:
+    def __init__(self, connection, pool, instance, batch_size: int = 1):
+        self.id = connection.id
+        self.sender_email = connection.sender_email
+        self.pool = pool
+        self.instance = instance
+        self.capabilities = instance.capabilities
+        self.batch_size = batch_size
+        self.health = ProviderHealth.for_provider(connection.id)
+
+class ProviderRouter:
+    """Spreads a campaign's sends over its provider pool, weighted by health.
+
+    Each send goes to a provider picked at random with probability
+    proportional to its score, skipping providers whose breaker is open.
+    A failed send can be retried on a provider it has not tried yet.
+    """
+    
+    def __init__(self, members: list):
+        self.members = members
+    
+    def pick(self, exclude=()) -> RouteMember:
+        candidates = [m for m in self.members if m.id not in exclude]
+        if not candidates:
+            return None
+        
+        healthy = [m for m in candidates if m.health.available()]
+        if not healthy:
+            # Everything is tripped; probe the one that has been resting longest
+            return min(candidates, key=lambda m: m.health.open_until)
+        
+        weights = [m.health.score() for m in healthy]
+        return random.choices(healthy, weights=weights)[0]
+    
+    def submit(self, member: RouteMember, stop=None, **message):
+        future = member.pool.submit(member.instance.send, from_email=member.sender_email, stop=stop, **message)
+        started = time.monotonic()
+        
+        def done(f):
+            member.health.record(send_result(f).get('success', False), time.monotonic() - started)
+        
+        future.add_done_callback(done)
+        return future
+    
+    def submit_batch(self, member: RouteMember, messages: list, template: dict = None, stop=None):
+        """Send ``messages`` in one provider call; the future's result is a list with one result per message."""
+        future = member.pool.submit(member.instance.send_batch, from_email=member.sender_email,
+                                    messages=messages, template=template, tokens=len(messages), stop=stop)
+        started = time.monotonic()
+        
+        def done(f):
+            results = send_results(f)
+            # Score latency per message so batching providers are not penalised for bigger calls
+            member.health.record(any(r.get('success') for r in results), (time.monotonic() - started) / len(messages))
+        
+        future.add_done_callback(done)
+        return future
+    
+    def close(self):
+        for member in self.members:
+            member.pool.close_provider(member.instance)
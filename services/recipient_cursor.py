@@ -0,0 +1,65 @@
+from models import db
+from models.recipient_list import Recipient
+from flask import current_app
+
+class RecipientCursor:
+    """Streams a list's recipients as (id, email, data) rows ordered by id.
+
+    Pages are fetched with keyset pagination (``id > last_id``) so every page
+    costs the same regardless of depth, and only one page is held in memory.
+    The first page is small so sending can start immediately; pages then grow
+    up to ``chunk_size``. ``until_id`` bounds the range for a campaign shard.
+    """
+    FIRST_CHUNK = 100
+    
+    def __init__(self, list_id: int, chunk_size: int = None, after_id: int = 0, until_id: int = None):
+        self.list_id = list_id
+        self.chunk_size = chunk_size or current_app.config.get('RECIPIENT_CHUNK_SIZE', 1000)
+        self.after_id = after_id or 0
+        self.until_id = until_id
+    
+    def pages(self):
+        last_id = self.after_id
+        limit = min(self.FIRST_CHUNK, self.chunk_size)
+        
+        while True:
+            query = db.session.query(Recipient.id, Recipient.email, Recipient.data).filter(
+                Recipient.list_id == self.list_id,
+                Recipient.id > last_id
+            )
+            if self.until_id is not None:
+                query = query.filter(Recipient.id <= self.until_id)
+            rows = query.order_by(Recipient.id).limit(limit).all()
+            
+            if rows:
+                yield rows
+            if len(rows) < limit:
+                return
+            
+            last_id = rows[-1].id
+            limit = min(limit * 2, self.chunk_size)
+    
+    def __iter__(self):
+        for page in self.pages():
+            yield from page
+    
+    def split(self, shards: int) -> list:
+        """Cut the remaining recipients into ``shards`` (after_id, until_id) ranges of equal size."""
+        remaining = db.session.query(Recipient.id).filter(
+            Recipient.list_id == self.list_id,
+            Recipient.id > self.after_id
+        )
+        if self.until_id is not None:
+            remaining = remaining.filter(Recipient.id <= self.until_id)
+        size = -(-remaining.count() // shards)
+        
+        ranges = []
+        after_id = self.after_id
+        for index in range(1, shards):
+            until_id = remaining.order_by(Recipient.id).offset(index * size - 1).limit(1).scalar()
+            if until_id is None:
+                break
+            ranges.append((after_id, until_id))
+            after_id = until_id
+        ranges.append((after_id, self.until_id))
+        return ranges
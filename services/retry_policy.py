@@ -0,0 +1,53 @@
+from flask import current_app
+import heapq
+import itertools
+import random
+import time
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for transient send failures.
+
+    Attempt ``n`` waits a random time between 0 and
+    ``min(max_delay, base_delay * 2 ** (n - 1))`` seconds, so retries from
+    many recipients spread out instead of hitting the provider together.
+    """
+    
+    def __init__(self, max_attempts: int = None, base_delay: float = None, max_delay: float = None):
+        config = current_app.config
+        self.max_attempts = max_attempts or config.get('SEND_RETRY_ATTEMPTS', 4)
+        self.base_delay = base_delay or config.get('SEND_RETRY_BASE_DELAY', 2.0)
+        self.max_delay = max_delay or config.get('SEND_RETRY_MAX_DELAY', 60.0)
+    
+    @staticmethod
+    def is_transient(result: dict) -> bool:
+        """Providers mark timeouts, 5xx/429 responses and SMTP 4xx deferrals as transient."""
+        return bool(result.get('transient') or result.get('throttled'))
+    
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+class DelayQueue:
+    """Min-heap of items keyed by the monotonic time they become due."""
+    
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+    
+    def __len__(self):
+        return len(self._heap)
+    
+    def push(self, delay: float, item):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), item))
+    
+    def pop_due(self) -> list:
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+    
+    def next_delay(self) -> float:
+        """Seconds until the next item is due, or None when empty."""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
@@ -0,0 +1,148 @@
+from models import db
+from models.campaign import Campaign
+from services.job_queue import JobQueue
+from services.sending_queue import SendingQueue
+from datetime import datetime
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class CampaignScheduler:
+    """Fires scheduled campaigns at their ``scheduled_at`` time.
+
+    Upcoming campaigns are kept in a min-heap of (scheduled_at, campaign_id)
+    and the thread sleeps until the earliest one is due, waking early only
+    when a new campaign is pushed. The heap is rebuilt from the database on
+    start and every ``resync_interval`` seconds, so campaigns scheduled
+    while no scheduler was listening are still picked up. Firing is a
+    conditional 'scheduled' -> 'queued' update, so several schedulers can
+    run at once without sending a campaign twice.
+    """
+    _current = None
+    
+    def __init__(self, app, resync_interval: float = None):
+        self.app = app
+        self.resync_interval = resync_interval or app.config.get('SCHEDULER_RESYNC_SECONDS', 300)
+        self._heap = []
+        self._wakeup = threading.Condition()
+        self._stop = False
+        self._thread = None
+    
+    @staticmethod
+    def current() -> 'CampaignScheduler':
+        """The scheduler running in this process, if any."""
+        return CampaignScheduler._current
+    
+    def start(self):
+        CampaignScheduler._current = self
+        self._thread = threading.Thread(target=self._loop, name='campaign-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def stop(self):
+        with self._wakeup:
+            self._stop = True
+            self._wakeup.notify()
+    
+    def join(self):
+        if self._thread:
+            self._thread.join()
+    
+    def push(self, campaign_id: int, scheduled_at: datetime):
+        with self._wakeup:
+            heapq.heappush(self._heap, (scheduled_at, campaign_id))
+            # Only the loop's deadline can change, and only if this is the new earliest entry
+            if self._heap[0][1] == campaign_id:
+                self._wakeup.notify()
+    
+    def load(self) -> int:
+        """Rebuild the heap from every campaign still waiting to be sent."""
+        upcoming = db.session.query(Campaign.scheduled_at, Campaign.id).filter(
+            Campaign.status == 'scheduled',
+            Campaign.scheduled_at.isnot(None)
+        ).order_by(Campaign.scheduled_at).all()
+        db.session.rollback()
+        
+        with self._wakeup:
+            # Rows come back sorted, which is already a valid heap
+            self._heap = [tuple(row) for row in upcoming]
+            self._wakeup.notify()
+        return len(upcoming)
+    
+    def _due(self, now: datetime) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        return due
+    
+    def _loop(self):
+        with self.app.app_context():
+            next_resync = 0
+            while True:
+                if time.monotonic() >= next_resync:
+                    try:
+                        self.load()
+                    except Exception:
+                        logger.exception('Failed to load scheduled campaigns')
+                        db.session.rollback()
+                    next_resync = time.monotonic() + self.resync_interval
+                
+                with self._wakeup:
+                    if self._stop:
+                        return
+                    due = self._due(datetime.utcnow())
+                    if not due:
+                        timeout = next_resync - time.monotonic()
+                        if self._heap:
+                            timeout = min(timeout, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+                        self._wakeup.wait(max(timeout, 0))
+                        continue
+                
+                for scheduled_at, campaign_id in due:
+                    try:
+                        self.fire(campaign_id, scheduled_at)
+                    except Exception:
+                        logger.exception('Failed to start scheduled campaign %s', campaign_id)
+                        db.session.rollback()
+    
+    @staticmethod
+    def fire(campaign_id: int, scheduled_at: datetime = None) -> bool:
+        """Queue a scheduled campaign if it is still waiting for this time slot."""
+        query = Campaign.query.filter(Campaign.id == campaign_id, Campaign.status == 'scheduled')
+        if scheduled_at is not None:
+            # A rescheduled campaign has a newer heap entry; ignore the stale one
+            query = query.filter(Campaign.scheduled_at == scheduled_at)
+        claimed = query.update({'status': 'queued', 'started_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        
+        if not claimed:
+            return False
+        
+        logger.info('Starting scheduled campaign %s', campaign_id)
+        SendingQueue.enqueue(campaign_id)
+        return True
+    
+    @staticmethod
+    def schedule(campaign_id: int) -> str:
+        """Tell a running scheduler about a newly scheduled campaign."""
+        return JobQueue.enqueue('schedule_campaign', {'campaign_id': campaign_id})
+    
+    @staticmethod
+    @JobQueue.register('schedule_campaign')
+    def _add_campaign(campaign_id: int):
+        campaign = db.session.get(Campaign, campaign_id)
+        if not campaign or campaign.status != 'scheduled' or not campaign.scheduled_at:
+            return
+        
+        scheduler = CampaignScheduler.current()
+        if scheduler:
+            scheduler.push(campaign.id, campaign.scheduled_at)
+        elif campaign.scheduled_at <= datetime.utcnow():
+            CampaignScheduler.fire(campaign.id, campaign.scheduled_at)
+        else:
+            # No scheduler in this process (e.g. a Celery consumer); wake up again when due
+            JobQueue.enqueue('schedule_campaign', {'campaign_id': campaign_id},
+                             delay=(campaign.scheduled_at - datetime.utcnow()).total_seconds())
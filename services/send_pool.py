@@ -0,0 +1,246 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from services.provider_factory import ProviderFactory
+from utils.token_bucket import TokenBucket
+from utils.adaptive_rate import AdaptiveRate
+from utils.rate_limiter import RateLimiter
+from collections import deque
+import math
+import threading
+import time
+
+DEFAULT_CONCURRENCY = 4
+
+TRANSACTIONAL = 'transactional'
+BULK = 'bulk'
+
+class SendStopped(Exception):
+    """A send was abandoned before dispatch because its ``stop`` callback returned true."""
+
+class LaneMetrics:
+    """Rolling submit-to-completion latency of one lane, checked against its SLO."""
+    
+    def __init__(self, slo_ms: float = None, window: int = 1000):
+        self.slo_ms = slo_ms
+        self.count = 0
+        self.slo_breaches = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        with self._lock:
+            self.count += 1
+            self._latencies.append(ms)
+            if self.slo_ms and ms > self.slo_ms:
+                self.slo_breaches += 1
+    
+    def percentile(self, latencies: list, q: float) -> float:
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, math.ceil(q * len(latencies)) - 1)], 1)
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'count': self.count,
+                'p50_ms': self.percentile(latencies, 0.50),
+                'p99_ms': self.percentile(latencies, 0.99),
+                'slo_ms': self.slo_ms,
+                'slo_breaches': self.slo_breaches
+            }
+
+class SendPool:
+    """Bounded concurrent sender shared by every campaign using one ProviderConnection.
+
+    At most ``concurrency`` sends are in flight at once; ``submit`` blocks the
+    caller when the pool is full, which keeps the campaign loop from running
+    ahead of the provider.
+    
+    Sends run in one of two lanes. Bulk sends may only hold
+    ``concurrency - reserved`` slots, so transactional sends never queue
+    behind a saturated campaign. Across processes, bulk sends are also
+    capped at ``1 - PRIORITY_RATE_SHARE`` of the connection's quota in the
+    shared RateLimiter, which keeps the rest of the quota free for
+    transactional sends made from the web process.
+    """
+    _pools = {}
+    _rates = {}
+    _lock = threading.Lock()
+    CONCURRENCY_SETTING = 'PROVIDER_CONCURRENCY'
+    STOP_POLL_SECONDS = 0.1
+    
+    def __init__(self, name: str, concurrency: int, rate: AdaptiveRate):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.bucket = rate.bucket
+        self.quotas = {}
+        config = current_app.config
+        self.reserved = min(concurrency - 1, max(1, int(concurrency * config.get('PRIORITY_RESERVED_FRACTION', 0.25))))
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._bulk_slots = threading.BoundedSemaphore(concurrency - self.reserved) if self.reserved else None
+        self.metrics = {
+            TRANSACTIONAL: LaneMetrics(config.get('TRANSACTIONAL_SLO_MS', 1000)),
+            BULK: LaneMetrics()
+        }
+        self._start(name)
+    
+    def _start(self, name: str):
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f'send-{name}')
+    
+    @classmethod
+    def concurrency_for(cls, provider_type: str) -> int:
+        limits = current_app.config.get(cls.CONCURRENCY_SETTING, {})
+        concurrency = limits.get(provider_type, DEFAULT_CONCURRENCY)
+        max_concurrency = ProviderFactory.capabilities(provider_type).max_concurrency
+        if max_concurrency:
+            concurrency = min(concurrency, max_concurrency)
+        return max(1, concurrency)
+    
+    @staticmethod
+    def rate_for(provider) -> AdaptiveRate:
+        """The AIMD-controlled token bucket pacing a ProviderConnection, shared by every sender in this process."""
+        period = provider.rate_period or 'minute'
+        with SendPool._lock:
+            rate = SendPool._rates.get(provider.id)
+            if rate is None:
+                rate = AdaptiveRate(
+                    TokenBucket(provider.rate_limit, period, provider.burst),
+                    decrease=current_app.config.get('AIMD_DECREASE', 0.5),
+                    increase=current_app.config.get('AIMD_INCREASE', 0.05)
+                )
+                SendPool._rates[provider.id] = rate
+        rate.configure(provider.rate_limit, period, provider.burst)
+        return rate
+    
+    @classmethod
+    def for_provider(cls, provider) -> 'SendPool':
+        rate = SendPool.rate_for(provider)
+        with SendPool._lock:
+            pool = cls._pools.get(provider.id)
+            if pool is None:
+                concurrency = cls.concurrency_for(provider.provider_type)
+                pool = cls(str(provider.id), concurrency, rate)
+                cls._pools[provider.id] = pool
+            pool.quotas = SendPool.lane_quotas(provider)
+            return pool
+    
+    @staticmethod
+    def quota_for(provider):
+        """Arguments for the shared RateLimiter that caps a connection's sends across all processes."""
+        if not provider.rate_limit:
+            return None
+        window = TokenBucket.PERIODS[provider.rate_period or 'minute']
+        lease = max(1, min(current_app.config.get('RATE_LIMIT_SEND_LEASE', 10), provider.rate_limit // 20))
+        return (f'provider:{provider.id}', provider.rate_limit, window, lease)
+    
+    @staticmethod
+    def lane_quotas(provider) -> dict:
+        """Shared RateLimiter arguments each lane acquires, in order, before a send.
+
+        Bulk sends take from their own key capped at ``1 - PRIORITY_RATE_SHARE``
+        of the rate and then from the connection's key, so however many
+        workers are sending campaigns the remaining share stays free for
+        transactional sends. The transactional key only counts that lane.
+        """
+        quota = SendPool.quota_for(provider)
+        if quota is None:
+            return {}
+        key, limit, window, lease = quota
+        share = current_app.config.get('PRIORITY_RATE_SHARE', 0.1)
+        bulk_limit = max(1, int(limit * (1 - share)))
+        return {
+            TRANSACTIONAL: [(f'{key}:{TRANSACTIONAL}', limit, window, 1), quota],
+            BULK: [(f'{key}:{BULK}', bulk_limit, window, min(lease, max(1, bulk_limit // 20))), quota]
+        }
+    
+    def provider_options(self, provider_type: str) -> dict:
+        """Connection pool settings for a provider, sized to this pool's concurrency."""
+        config = current_app.config
+        if provider_type == 'smtp':
+            return {
+                'pool_size': self.concurrency,
+                'max_messages': config.get('SMTP_MAX_MESSAGES_PER_CONNECTION', 100),
+                'idle_timeout': config.get('SMTP_IDLE_TIMEOUT', 30)
+            }
+        if provider_type in ['sendgrid', 'mailgun', 'brevo']:
+            return {
+                'pool_size': self.concurrency,
+                'retries': config.get('HTTP_CONNECT_RETRIES', 2),
+                'prewarm': True
+            }
+        return {}
+    
+    def create_provider(self, provider_type: str, credentials: dict):
+        return ProviderFactory.create(provider_type, credentials, **self.provider_options(provider_type))
+    
+    def close_provider(self, provider_instance):
+        provider_instance.close()
+    
+    def call(self, fn, *args):
+        """Run a provider call outside the send lanes, such as uploading a template."""
+        return fn(*args)
+    
+    def _dispatch(self, fn, args, kwargs):
+        return self.executor.submit(fn, *args, **kwargs)
+    
+    def _acquire(self, lane: str, tokens: int = 1, stop=None):
+        if lane != TRANSACTIONAL and self._bulk_slots:
+            self._bulk_slots.acquire()
+        self._slots.acquire()
+        if not stop:
+            self.bucket.acquire(tokens)
+            return
+        
+        # Wait in short steps so a pause or cancel is not stuck behind a batch's tokens
+        ready_at = time.monotonic() + self.bucket.reserve(tokens)
+        while time.monotonic() < ready_at:
+            if stop():
+                self.bucket.refund(tokens)
+                raise SendStopped()
+            time.sleep(min(ready_at - time.monotonic(), self.STOP_POLL_SECONDS))
+    
+    def _release(self, lane: str):
+        self._slots.release()
+        if lane != TRANSACTIONAL and self._bulk_slots:
+            self._bulk_slots.release()
+    
+    def submit(self, fn, *args, lane: str = BULK, tokens: int = 1, stop=None, **kwargs):
+        """Run ``fn`` in the pool; a batch call takes one slot but ``tokens`` (one per message) of rate.
+
+        While the send waits for its rate, ``stop`` is polled; if it returns
+        true, SendStopped is raised and ``fn`` is never called.
+        """
+        started = time.monotonic()
+        try:
+            self._acquire(lane, tokens, stop)
+            for quota in self.quotas.get(lane, []):
+                for _ in range(tokens):
+                    if not RateLimiter.default().acquire(*quota, stop=stop, poll=self.STOP_POLL_SECONDS):
+                        raise SendStopped()
+            future = self._dispatch(fn, args, kwargs)
+        except Exception:
+            self._release(lane)
+            raise
+        
+        def done(f):
+            self._release(lane)
+            self.metrics[lane].observe(time.monotonic() - started)
+            for result in send_results(f):
+                self.rate.observe(result)
+        
+        future.add_done_callback(done)
+        return future
+
+def send_result(future) -> dict:
+    """Return the provider result for a finished send future."""
+    error = future.exception()
+    if error is not None:
+        return {'success': False, 'error': str(error)}
+    return future.result()
+
+def send_results(future) -> list:
+    """Return a result per message for a finished send or batch send future."""
+    result = send_result(future)
+    return result if isinstance(result, list) else [result]
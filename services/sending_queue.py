@@ -1,97 +1,610 @@
 from models import db
-from models.campaign import Campaign, CampaignLog
-from models.recipient_list import Recipient
+from models.campaign import Campaign, CampaignLog, CampaignShard
 from models.provider import ProviderConnection
 from models.user import User
-from services.provider_factory import ProviderFactory
+from models.recipient_list import Recipient
+from models.dead_letter import DeadLetter
 from services.template_engine import TemplateEngine
+from services.job_queue import JobQueue
+from services.send_pool import SendPool, SendStopped, TRANSACTIONAL, send_result, send_results
+from services.async_engine import AsyncSendPool
+from services.provider_router import ProviderRouter, RouteMember
+from services.log_writer import CampaignLogWriter
+from services.recipient_cursor import RecipientCursor
+from services.checkpoint import CampaignCheckpoint
+from services.retry_policy import RetryPolicy, DelayQueue
+from services.sent_ledger import SentLedger
+from services.stored_templates import StoredTemplates
 from utils.crypto import CredentialEncryption
 from flask import current_app
+from sqlalchemy import or_, and_, exists
 import json
+import logging
 import time
-from datetime import datetime, date
+from concurrent.futures import wait, FIRST_COMPLETED
+from datetime import datetime, date, timedelta
+
+logger = logging.getLogger(__name__)
 
 class SendingQueue:
     @staticmethod
-    def enqueue(campaign_id: int):
-        from threading import Thread
-        thread = Thread(target=SendingQueue._process_campaign, args=(campaign_id,))
-        thread.daemon = True
-        thread.start()
+    def enqueue(campaign_id: int) -> str:
+        user_id = db.session.query(Campaign.user_id).filter_by(id=campaign_id).scalar()
+        return JobQueue.enqueue('send_campaign', {'campaign_id': campaign_id}, tenant=user_id)
     
     @staticmethod
-    def _process_campaign(campaign_id: int):
-        from app_production import app
+    def _pool_for(provider: ProviderConnection) -> SendPool:
+        if current_app.config.get('SEND_ENGINE') == 'asyncio':
+            return AsyncSendPool.for_provider(provider)
+        return SendPool.for_provider(provider)
+    
+    @staticmethod
+    def _router_for(campaign: Campaign) -> ProviderRouter:
+        """The campaign's provider plus any verified connections in its provider_pool."""
+        ids = [campaign.provider_id] + [i for i in (campaign.provider_pool or []) if i != campaign.provider_id]
+        connections = {p.id: p for p in ProviderConnection.query.filter(
+            ProviderConnection.id.in_(ids),
+            ProviderConnection.user_id == campaign.user_id
+        ).all()}
+        crypto = CredentialEncryption(current_app.config['ENCRYPTION_KEY'])
         
-        with app.app_context():
-            campaign = Campaign.query.get(campaign_id)
-            if not campaign:
-                return
+        members = []
+        for provider_id in ids:
+            provider = connections.get(provider_id)
+            if not provider or (provider_id != campaign.provider_id and not provider.is_verified):
+                continue
+            credentials = json.loads(crypto.decrypt(provider.encrypted_credentials))
+            pool = SendingQueue._pool_for(provider)
+            instance = pool.create_provider(provider.provider_type, credentials)
+            members.append(RouteMember(provider, pool, instance, SendingQueue._batch_size(pool, instance)))
+        
+        if not members:
+            raise ValueError(f'Campaign {campaign.id} has no usable provider')
+        return ProviderRouter(members)
+    
+    @staticmethod
+    def _batch_size(pool: SendPool, instance) -> int:
+        """Messages per provider call: 1 unless the provider can send a batch in one request."""
+        config = current_app.config
+        size = min(instance.capabilities.max_batch_size, config.get('SEND_BATCH_SIZE', 1000))
+        if pool.bucket.fill_rate:
+            # The bucket paces a batch by taking one token per message, so the burst
+            # does not limit it; only keep the wait for a full batch bounded
+            size = min(size, int(pool.bucket.fill_rate * config.get('SEND_BATCH_MAX_WAIT', 30)))
+        return max(1, size)
+    
+    @staticmethod
+    def _stale_before() -> datetime:
+        return datetime.utcnow() - timedelta(seconds=current_app.config.get('CAMPAIGN_HEARTBEAT_TIMEOUT', 120))
+    
+    @staticmethod
+    def _claim(campaign_id: int) -> bool:
+        """Take ownership of a campaign unless another worker is actively sending it."""
+        claimed = Campaign.query.filter(
+            Campaign.id == campaign_id,
+            or_(
+                Campaign.status == 'queued',
+                and_(
+                    Campaign.status == 'sending',
+                    or_(Campaign.heartbeat_at.is_(None), Campaign.heartbeat_at < SendingQueue._stale_before())
+                )
+            )
+        ).update({'status': 'sending', 'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        return bool(claimed)
+    
+    @staticmethod
+    def resume(campaign_id: int) -> str:
+        """Re-queue a campaign; sending continues after its last checkpoint.
+
+        A 'sending' or 'paused' campaign is only resumed once no worker is
+        heartbeating it or any of its shards, so a run that is still going
+        (or still finishing its in-flight sends) is never started twice.
+        Returns None if the campaign cannot be resumed yet.
+        """
+        stale_before = SendingQueue._stale_before()
+        shard_running = exists().where(
+            CampaignShard.campaign_id == Campaign.id,
+            CampaignShard.status == 'sending',
+            CampaignShard.heartbeat_at >= stale_before
+        )
+        resumed = Campaign.query.filter(
+            Campaign.id == campaign_id,
+            or_(
+                Campaign.status == 'failed',
+                and_(
+                    Campaign.status.in_(['sending', 'paused']),
+                    or_(Campaign.heartbeat_at.is_(None), Campaign.heartbeat_at < stale_before)
+                )
+            ),
+            ~shard_running
+        ).update({'status': 'queued'}, synchronize_session=False)
+        db.session.commit()
+        if not resumed:
+            return None
+        return SendingQueue.enqueue(campaign_id)
+    
+    @staticmethod
+    def pause(campaign_id: int) -> bool:
+        """Stop a queued or sending campaign after its in-flight sends; resume continues from the checkpoint."""
+        paused = Campaign.query.filter(
+            Campaign.id == campaign_id,
+            Campaign.status.in_(['queued', 'sending'])
+        ).update({'status': 'paused'}, synchronize_session=False)
+        db.session.commit()
+        return bool(paused)
+    
+    @staticmethod
+    def cancel(campaign_id: int) -> bool:
+        """Stop a campaign for good; workers notice within CAMPAIGN_CONTROL_SECONDS."""
+        cancelled = Campaign.query.filter(
+            Campaign.id == campaign_id,
+            Campaign.status.in_(['draft', 'scheduled', 'queued', 'sending', 'paused'])
+        ).update({'status': 'cancelled', 'completed_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        return bool(cancelled)
+    
+    @staticmethod
+    def replay_dead_letters(campaign_id: int) -> str:
+        """Re-queue a completed campaign to resend only its dead-lettered recipients.
+
+        A failed campaign still has recipients past its checkpoint and must be
+        resumed instead; a replay ends as 'completed'. Returns None if the
+        campaign is not completed.
+        """
+        replaying = Campaign.query.filter_by(id=campaign_id, status='completed').update(
+            {'status': 'queued'}, synchronize_session=False
+        )
+        # Committed before enqueueing so a broker-backed worker sees 'queued'
+        db.session.commit()
+        if not replaying:
+            return None
+        user_id = db.session.query(Campaign.user_id).filter_by(id=campaign_id).scalar()
+        return JobQueue.enqueue('send_campaign', {'campaign_id': campaign_id, 'replay': True}, tenant=user_id)
+    
+    @staticmethod
+    def send_transactional(provider: ProviderConnection, **message) -> dict:
+        """Send one message now in the provider's transactional lane and wait for the result."""
+        crypto = CredentialEncryption(current_app.config['ENCRYPTION_KEY'])
+        credentials = json.loads(crypto.decrypt(provider.encrypted_credentials))
+        pool = SendingQueue._pool_for(provider)
+        instance = pool.create_provider(provider.provider_type, credentials)
+        try:
+            future = pool.submit(instance.send, from_email=provider.sender_email, lane=TRANSACTIONAL, **message)
+            # Raises TimeoutError if the provider has not answered in time
+            future.exception(current_app.config.get('TRANSACTIONAL_TIMEOUT', 30))
+            return send_result(future)
+        finally:
+            pool.close_provider(instance)
+    
+    @staticmethod
+    def recover_orphans() -> list:
+        """Re-enqueue campaigns stuck in 'sending' whose worker stopped heartbeating."""
+        orphans = Campaign.query.filter(
+            Campaign.status == 'sending',
+            or_(Campaign.heartbeat_at.is_(None), Campaign.heartbeat_at < SendingQueue._stale_before())
+        ).all()
+        
+        for campaign in orphans:
+            SendingQueue.enqueue(campaign.id)
+        
+        return [campaign.id for campaign in orphans]
+    
+    @staticmethod
+    def _dead_letter_recipients(campaign_id: int) -> list:
+        """Recipients of a campaign waiting in the dead-letter table, as (id, email, data) rows."""
+        return db.session.query(Recipient.id, Recipient.email, Recipient.data).join(
+            DeadLetter, DeadLetter.recipient_id == Recipient.id
+        ).filter(
+            DeadLetter.campaign_id == campaign_id,
+            DeadLetter.replayed_at.is_(None)
+        ).order_by(Recipient.id).distinct().all()
+    
+    @staticmethod
+    def _send(campaign: Campaign, router: ProviderRouter, recipients, log_writer: CampaignLogWriter,
+              checkpoint: CampaignCheckpoint = None, already_logged: set = frozenset(), can_yield: bool = True) -> str:
+        """Send ``campaign`` to ``recipients``.
+        
+        Returns None once every recipient has a result, 'yielded' if it stopped
+        early to let another tenant run, or 'paused'/'cancelled' if the user
+        stopped the campaign. A stop is noticed within ``CAMPAIGN_CONTROL_SECONDS``;
+        sends already in flight are still recorded, and pending retries are
+        dropped (a paused campaign's checkpoint keeps them for the resume).
+        
+        How each provider is sent to follows its declared capabilities:
+        providers that accept batches get up to ``member.batch_size``
+        recipients per call, with the campaign template rendered server-side
+        from each recipient's variables when the provider supports it, and
+        pre-rendered otherwise. In 'stored' TEMPLATE_MODE the template is
+        uploaded to providers that can store it, and their messages carry
+        only variables. Results are still recorded, retried and failed over
+        per recipient.
+        """
+        pending = {}
+        batches = {}
+        retries = DelayQueue()
+        policy = RetryPolicy()
+        control_seconds = current_app.config.get('CAMPAIGN_CONTROL_SECONDS', 0.5)
+        next_control = time.monotonic() + control_seconds
+        stopped = None
+        
+        template_mode = current_app.config.get('TEMPLATE_MODE', 'inline')
+        member_templates = {}
+        text_template = campaign.text_body or (TemplateEngine.html_to_text(campaign.html_body) if campaign.html_body else None)
+        template = {
+            'subject': campaign.subject,
+            'html_body': campaign.html_body or text_template,
+            'text_body': text_template
+        }
+        
+        def idempotency(member, recipient) -> dict:
+            if not member.capabilities.idempotency_keys:
+                return {}
+            return {'idempotency_key': SentLedger.key(campaign.id, recipient.id)}
+        
+        def render(member, recipient, variables) -> dict:
+            html_body = TemplateEngine.render(campaign.html_body, variables) if campaign.html_body else None
+            text_body = TemplateEngine.render(campaign.text_body, variables) if campaign.text_body else None
+            
+            if not text_body and html_body:
+                text_body = TemplateEngine.html_to_text(html_body)
             
+            return {
+                'to_email': recipient.email,
+                'subject': TemplateEngine.render(campaign.subject, variables),
+                'html_body': html_body or text_body,
+                'text_body': text_body,
+                **idempotency(member, recipient)
+            }
+        
+        def template_for(member) -> dict:
+            """The campaign template, with the provider's stored copy's id in 'stored' TEMPLATE_MODE."""
+            if member not in member_templates:
+                template_id = None
+                if template_mode == 'stored' and member.capabilities.stored_templates:
+                    template_id = StoredTemplates.template_id(member, template)
+                member_templates[member] = dict(template, template_id=template_id) if template_id else template
+            return member_templates[member]
+        
+        def dispatch(recipient, variables, tried, attempt, member=None):
+            member = member or router.pick()
+            item = (recipient, variables, tried + [member.id], attempt)
+            if member.batch_size > 1 or template_for(member).get('template_id'):
+                batch = batches.setdefault(member, [])
+                batch.append(item)
+                if len(batch) >= member.batch_size:
+                    flush_batch(member)
+                return
             try:
-                campaign.status = 'sending'
-                db.session.commit()
-                
-                provider = ProviderConnection.query.get(campaign.provider_id)
-                user = User.query.get(campaign.user_id)
-                
-                crypto = CredentialEncryption(current_app.config['ENCRYPTION_KEY'])
-                credentials = json.loads(crypto.decrypt(provider.encrypted_credentials))
-                
-                provider_instance = ProviderFactory.create(provider.provider_type, credentials)
-                
-                recipients = Recipient.query.filter_by(list_id=campaign.list_id).all()
-                
-                sent = 0
-                failed = 0
-                
-                for recipient in recipients:
-                    variables = recipient.data or {}
-                    variables['email'] = recipient.email
-                    
-                    subject = TemplateEngine.render(campaign.subject, variables)
-                    html_body = TemplateEngine.render(campaign.html_body, variables) if campaign.html_body else None
-                    text_body = TemplateEngine.render(campaign.text_body, variables) if campaign.text_body else None
-                    
-                    if not text_body and html_body:
-                        text_body = TemplateEngine.html_to_text(html_body)
-                    
-                    result = provider_instance.send(
-                        from_email=provider.sender_email,
-                        to_email=recipient.email,
-                        subject=subject,
-                        html_body=html_body or text_body,
-                        text_body=text_body
-                    )
-                    
-                    log = CampaignLog(
-                        campaign_id=campaign.id,
-                        recipient_email=recipient.email,
-                        status='sent' if result['success'] else 'failed',
-                        error_message=result.get('error')
-                    )
-                    db.session.add(log)
-                    
-                    if result['success']:
-                        sent += 1
-                    else:
-                        failed += 1
-                    
-                    time.sleep(1.0 / provider.rate_limit * 60)
-                
-                campaign.sent_count = sent
-                campaign.failed_count = failed
-                campaign.status = 'completed'
-                campaign.completed_at = datetime.utcnow()
+                pending[router.submit(member, stop=check_control, **render(member, recipient, variables))] = [item]
+            except SendStopped:
+                # Stopped while waiting for rate; never sent, so a resume sends it
+                pass
+        
+        def flush_batch(member):
+            items = batches.pop(member)
+            member_template = template_for(member)
+            if member.capabilities.server_side_templating or member_template.get('template_id'):
+                messages = [{
+                    'to_email': recipient.email,
+                    'variables': variables,
+                    **idempotency(member, recipient)
+                } for recipient, variables, _, _ in items]
+            else:
+                member_template = None
+                messages = [render(member, recipient, variables) for recipient, variables, _, _ in items]
+            try:
+                pending[router.submit_batch(member, messages, member_template, stop=check_control)] = items
+            except SendStopped:
+                pass
+        
+        def flush_batches():
+            for member in list(batches):
+                flush_batch(member)
+        
+        def record(future):
+            items = pending.pop(future)
+            results = send_results(future)
+            if len(results) != len(items):
+                # The whole call failed; every message in it gets that result
+                results = results[:1] * len(items)
+            for item, result in zip(items, results):
+                record_result(item, result)
+        
+        def record_result(item, result):
+            recipient, variables, tried, attempt = item
+            if not result['success']:
+                if RetryPolicy.is_transient(result):
+                    if attempt < policy.max_attempts:
+                        # Back off without holding up the rest of the campaign
+                        retries.push(policy.delay(attempt), (recipient, variables, tried, attempt + 1))
+                        return
+                    log_writer.add(recipient.id, recipient.email, False, result.get('error'), dead_letter_attempts=attempt)
+                    return
+                # Fail over to a provider this recipient has not tried yet
+                fallback = router.pick(exclude=tried)
+                if fallback:
+                    dispatch(recipient, variables, tried, attempt, member=fallback)
+                    return
+            log_writer.add(recipient.id, recipient.email, result['success'], result.get('error'),
+                           provider_id=tried[-1], message_id=result.get('message_id'))
+        
+        def retry_due():
+            for item in retries.pop_due():
+                dispatch(*item)
+        
+        def check_control():
+            nonlocal stopped, next_control
+            if stopped or time.monotonic() < next_control:
+                return stopped
+            next_control = time.monotonic() + control_seconds
+            stopped = SendingQueue._stop_requested(campaign.id)
+            return stopped
+        
+        def drain():
+            # Batches still filling up are dropped on a stop; the checkpoint keeps them for a resume
+            while pending or ((retries or batches) and not stopped):
+                if not check_control():
+                    retry_due()
+                    flush_batches()
+                if pending:
+                    timeout = min(retries.next_delay() or control_seconds, control_seconds)
+                    done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future)
+                else:
+                    time.sleep(min(retries.next_delay() or 0, control_seconds))
+        
+        # Send for one time slice, then hand the worker to another tenant if anyone is waiting
+        slice_seconds = current_app.config.get('CAMPAIGN_SLICE_SECONDS', 30)
+        slice_ends = time.monotonic() + slice_seconds
+        yielded = False
+        
+        try:
+            # The ledger is checked per page, so progress made by another worker is skipped too
+            for recipient in SentLedger.unsent(campaign.id, recipients):
+                if recipient.id in already_logged:
+                    continue
                 
-                if user.last_send_date != date.today():
-                    user.daily_send_count = 0
-                    user.last_send_date = date.today()
+                variables = TemplateEngine.build_variables(recipient.email, recipient.data, campaign.variable_mapping)
+                if checkpoint:
+                    checkpoint.dispatched(recipient.id)
+                dispatch(recipient, variables, [], 1)
                 
-                user.daily_send_count += sent
+                for done in [f for f in pending if f.done()]:
+                    record(done)
+                retry_due()
                 
-                db.session.commit()
+                if check_control():
+                    break
                 
-            except Exception as e:
-                campaign.status = 'failed'
-                db.session.commit()
+                if time.monotonic() >= slice_ends and can_yield:
+                    if JobQueue.has_waiting():
+                        yielded = True
+                        break
+                    slice_ends = time.monotonic() + slice_seconds
+            
+            drain()
+        except Exception:
+            db.session.rollback()
+            # Keep results of sends that already went out so a resume skips them
+            try:
+                drain()
+                log_writer.flush()
+            except Exception:
+                db.session.rollback()
+            raise
+        finally:
+            # Also after a failure, so per-run SES templates and pooled connections are released
+            router.close()
+        
+        log_writer.flush()
+        return stopped or ('yielded' if yielded else None)
+    
+    @staticmethod
+    def _stop_requested(campaign_id: int) -> str:
+        status = db.session.query(Campaign.status).filter_by(id=campaign_id).scalar()
+        return status if status in ['paused', 'cancelled'] else None
+    
+    @staticmethod
+    def _count_sends(user: User, sent: int):
+        if user.last_send_date != date.today():
+            user.daily_send_count = sent
+            user.last_send_date = date.today()
+        else:
+            # Shards of one campaign finish concurrently; add in SQL so no update is lost
+            user.daily_send_count = User.daily_send_count + sent
+    
+    @staticmethod
+    def _split(campaign: Campaign) -> list:
+        """Cut a large campaign into id-range shards, or return [] if it is too small to be worth it."""
+        config = current_app.config
+        remaining = (campaign.total_recipients or 0) - (campaign.sent_count or 0) - (campaign.failed_count or 0)
+        count = min(config.get('CAMPAIGN_SHARDS', 1), remaining // max(1, config.get('CAMPAIGN_SHARD_MIN_RECIPIENTS', 50000)))
+        if count < 2:
+            return []
+        
+        ranges = RecipientCursor(campaign.list_id, after_id=campaign.last_recipient_id).split(count)
+        if len(ranges) < 2:
+            return []
+        
+        shards = [CampaignShard(campaign_id=campaign.id, after_id=after_id, until_id=until_id,
+                                last_recipient_id=after_id, status='queued') for after_id, until_id in ranges]
+        db.session.add_all(shards)
+        db.session.commit()
+        return shards
+    
+    @staticmethod
+    def _start_shards(campaign: Campaign, shards: list) -> list:
+        """Queue a job for every shard that has not finished yet."""
+        unfinished = [shard for shard in shards if shard.status != 'completed']
+        for shard in unfinished:
+            if shard.status == 'failed':
+                shard.status = 'queued'
+        campaign.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+        
+        job_ids = [JobQueue.enqueue('send_campaign_shard', {'shard_id': shard.id}, tenant=campaign.user_id)
+                   for shard in unfinished]
+        if not unfinished:
+            SendingQueue._finish_sharded(campaign.id)
+        return job_ids
+    
+    @staticmethod
+    def _claim_shard(shard_id: int) -> bool:
+        claimed = CampaignShard.query.filter(
+            CampaignShard.id == shard_id,
+            or_(
+                CampaignShard.status == 'queued',
+                and_(
+                    CampaignShard.status == 'sending',
+                    or_(CampaignShard.heartbeat_at.is_(None), CampaignShard.heartbeat_at < SendingQueue._stale_before())
+                )
+            )
+        ).update({'status': 'sending', 'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        return bool(claimed)
+    
+    @staticmethod
+    def _finish_sharded(campaign_id: int) -> bool:
+        """Settle a sharded campaign once no shard is left to send: failed if any shard failed, else completed."""
+        shards = CampaignShard.query.filter_by(campaign_id=campaign_id)
+        if shards.filter(CampaignShard.status.in_(['queued', 'sending'])).count():
+            return False
+        
+        if shards.filter_by(status='failed').count():
+            values = {'status': 'failed'}
+        else:
+            values = {'status': 'completed', 'completed_at': datetime.utcnow()}
+        finished = Campaign.query.filter_by(id=campaign_id, status='sending').update(values, synchronize_session=False)
+        db.session.commit()
+        return bool(finished)
+    
+    @staticmethod
+    @JobQueue.register('send_campaign')
+    def _process_campaign(campaign_id: int, replay: bool = False):
+        campaign = db.session.get(Campaign, campaign_id)
+        if not campaign or campaign.status not in ['queued', 'sending']:
+            return
+        
+        if not SendingQueue._claim(campaign_id):
+            # Still heartbeating elsewhere; fail the job so it is retried later
+            raise RuntimeError(f'Campaign {campaign_id} is being sent by another worker')
+        
+        if not replay:
+            # Big campaigns are sent as id-range shards, each its own job, so
+            # several worker processes (and cores) can render and send in parallel
+            shards = campaign.shards or SendingQueue._split(campaign)
+            if shards:
+                SendingQueue._start_shards(campaign, shards)
+                return
+        
+        try:
+            user = User.query.get(campaign.user_id)
+            router = SendingQueue._router_for(campaign)
+            
+            if replay:
+                # Previously dead-lettered recipients only; the checkpoint stays where it is
+                replaying = [row.id for row in DeadLetter.query.with_entities(DeadLetter.id).filter_by(
+                    campaign_id=campaign.id, replayed_at=None
+                )]
+                replay_started = datetime.utcnow()
+                log_writer = CampaignLogWriter(campaign.id, replay=True)
+                outcome = SendingQueue._send(campaign, router, SendingQueue._dead_letter_recipients(campaign.id),
+                                             log_writer, can_yield=False)
+                # Only recipients that got a new result; a stopped replay leaves the rest for next time
+                resent = db.session.query(CampaignLog.recipient_id).filter(
+                    CampaignLog.campaign_id == campaign.id,
+                    CampaignLog.sent_at >= replay_started
+                )
+                DeadLetter.query.filter(DeadLetter.id.in_(replaying), DeadLetter.recipient_id.in_(resent)).update(
+                    {'replayed_at': datetime.utcnow()}, synchronize_session=False
+                )
+            else:
+                checkpoint = CampaignCheckpoint(campaign.last_recipient_id)
+                log_writer = CampaignLogWriter(campaign.id, checkpoint=checkpoint)
+                outcome = SendingQueue._send(
+                    campaign, router,
+                    RecipientCursor(campaign.list_id, after_id=campaign.last_recipient_id),
+                    log_writer, checkpoint,
+                    CampaignCheckpoint.logged_after(campaign.id, campaign.last_recipient_id)
+                )
+            
+            # Clearing the heartbeat tells resume() this run has finished. The
+            # status only moves on from 'sending', so a pause or cancel committed
+            # after _send's last control check keeps the status the user gave it
+            running = Campaign.query.filter_by(id=campaign.id, status='sending')
+            Campaign.query.filter_by(id=campaign.id).update({'heartbeat_at': None}, synchronize_session=False)
+            moved = 0
+            if outcome == 'yielded':
+                moved = running.update({'status': 'queued'}, synchronize_session=False)
+            elif outcome is None:
+                running.update({'status': 'completed', 'completed_at': datetime.utcnow()}, synchronize_session=False)
+            
+            SendingQueue._count_sends(user, log_writer.total_sent)
+            if moved:
+                # Commits with the status change; continues from the checkpoint
+                # once the fair queue picks this tenant again
+                SendingQueue.enqueue(campaign.id)
+            db.session.commit()
+            JobQueue.charge(user.id, log_writer.total_sent + log_writer.total_failed)
+            
+        except Exception:
+            logger.exception('Campaign %s failed', campaign_id)
+            db.session.rollback()
+            Campaign.query.filter_by(id=campaign_id).update({'heartbeat_at': None}, synchronize_session=False)
+            Campaign.query.filter_by(id=campaign_id, status='sending').update({'status': 'failed'}, synchronize_session=False)
+            db.session.commit()
+    
+    @staticmethod
+    @JobQueue.register('send_campaign_shard')
+    def _process_shard(shard_id: int):
+        shard = db.session.get(CampaignShard, shard_id)
+        if not shard or shard.status == 'completed' or shard.campaign.status != 'sending':
+            return
+        
+        if not SendingQueue._claim_shard(shard_id):
+            raise RuntimeError(f'Campaign shard {shard_id} is being sent by another worker')
+        
+        campaign = shard.campaign
+        
+        try:
+            user = User.query.get(campaign.user_id)
+            router = SendingQueue._router_for(campaign)
+            checkpoint = CampaignCheckpoint(shard.last_recipient_id)
+            log_writer = CampaignLogWriter(campaign.id, checkpoint=checkpoint, shard_id=shard.id)
+            
+            # Sends go through this process's provider pools and the shared
+            # RateLimiter quota, so all shards together keep to the provider's rate
+            outcome = SendingQueue._send(
+                campaign, router,
+                RecipientCursor(campaign.list_id, after_id=shard.last_recipient_id, until_id=shard.until_id),
+                log_writer, checkpoint,
+                CampaignCheckpoint.logged_after(campaign.id, shard.last_recipient_id, shard.until_id)
+            )
+            
+            # A paused shard waits as 'queued' until the campaign is resumed
+            CampaignShard.query.filter_by(id=shard.id, status='sending').update({
+                'status': {None: 'completed', 'cancelled': 'cancelled'}.get(outcome, 'queued'),
+                'heartbeat_at': None
+            }, synchronize_session=False)
+            SendingQueue._count_sends(user, log_writer.total_sent)
+            db.session.commit()
+            
+            campaign_status = db.session.query(Campaign.status).filter_by(id=campaign.id).scalar()
+            if outcome == 'yielded' and campaign_status == 'sending':
+                # Not after a pause or cancel the user committed since _send's last control check
+                JobQueue.enqueue('send_campaign_shard', {'shard_id': shard.id}, tenant=campaign.user_id)
+            elif outcome is None:
+                SendingQueue._finish_sharded(campaign.id)
+            JobQueue.charge(user.id, log_writer.total_sent + log_writer.total_failed)
+            
+        except Exception:
+            logger.exception('Shard %s of campaign %s failed', shard_id, campaign.id)
+            db.session.rollback()
+            # The other shards keep going and the campaign fails once they finish;
+            # resuming it then restarts this shard from its checkpoint
+            shard.status = 'failed'
+            shard.heartbeat_at = None
+            db.session.commit()
+            SendingQueue._finish_sharded(campaign.id)
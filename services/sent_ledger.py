@@ -0,0 +1,57 @@
+from models import db
+from models.sent_ledger import SentMessage
+from flask import current_app
+from sqlalchemy import insert
+import hashlib
+import hmac
+
+class SentLedger:
+    """Record of every message a provider accepted, keyed by its idempotency key.
+
+    The key is derived from (campaign id, recipient id), so a retry, a resume
+    or a second worker sending the same recipient always produces the same
+    key. Rows are written with the campaign's log rows; the send loop skips
+    recipients already in the ledger and passes the key to the provider so a
+    resend of a message whose outcome was lost can still be recognised.
+    """
+    
+    @staticmethod
+    def key(campaign_id: int, recipient_id: int) -> str:
+        # Keyed with the installation's secret so keys never collide with another deployment's
+        secret = current_app.config['ENCRYPTION_KEY'].encode()
+        digest = hmac.new(secret, f'{campaign_id}:{recipient_id}'.encode(), hashlib.sha256).hexdigest()
+        return f'{campaign_id}-{recipient_id}-{digest[:16]}'
+    
+    @staticmethod
+    def sent_between(campaign_id: int, first_id: int, last_id: int) -> set:
+        rows = db.session.query(SentMessage.recipient_id).filter(
+            SentMessage.campaign_id == campaign_id,
+            SentMessage.recipient_id.between(first_id, last_id)
+        ).all()
+        return {recipient_id for (recipient_id,) in rows}
+    
+    @staticmethod
+    def unsent(campaign_id: int, recipients, page_size: int = 500):
+        """Yield the recipients (ordered by id) that have no ledger row, checking one page at a time."""
+        pages = recipients.pages() if hasattr(recipients, 'pages') else (
+            recipients[i:i + page_size] for i in range(0, len(recipients), page_size)
+        )
+        for page in pages:
+            if not page:
+                continue
+            sent = SentLedger.sent_between(campaign_id, page[0].id, page[-1].id)
+            for recipient in page:
+                if recipient.id not in sent:
+                    yield recipient
+    
+    @staticmethod
+    def insert_statement():
+        """INSERT that skips keys already recorded (e.g. by a worker whose lease expired)."""
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+            return pg_insert(SentMessage).on_conflict_do_nothing()
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            return sqlite_insert(SentMessage).on_conflict_do_nothing()
+        return insert(SentMessage).prefix_with('IGNORE')
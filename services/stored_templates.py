@@ -0,0 +1,43 @@
+from models import db
+from models.provider_template import ProviderTemplate
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StoredTemplates:
+    """Campaign templates uploaded to providers, keyed by content hash.
+
+    A template is uploaded to a ProviderConnection the first time it is
+    needed and its provider-side id recorded, so later runs, shards and
+    campaigns with the same content reuse it instead of uploading again.
+    """
+    
+    @staticmethod
+    def content_hash(sender_email: str, template: dict) -> str:
+        content = '\0'.join([sender_email, template['subject'], template['html_body'], template.get('text_body') or ''])
+        return hashlib.sha256(content.encode()).hexdigest()
+    
+    @staticmethod
+    def template_id(member, template: dict) -> str:
+        """The provider's id for ``template``, uploading it first if needed; None if the upload fails."""
+        content_hash = StoredTemplates.content_hash(member.sender_email, template)
+        stored = ProviderTemplate.query.filter_by(provider_id=member.id, content_hash=content_hash).first()
+        if stored:
+            return stored.remote_id
+        
+        try:
+            remote_id = str(member.pool.call(member.instance.store_template, member.sender_email, template))
+        except Exception:
+            logger.exception('Failed to store template on provider %s; sending rendered messages', member.id)
+            return None
+        
+        try:
+            with db.session.begin_nested():
+                db.session.add(ProviderTemplate(provider_id=member.id, content_hash=content_hash, remote_id=remote_id))
+        except IntegrityError:
+            # Another worker stored the same template first; use theirs
+            return ProviderTemplate.query.filter_by(provider_id=member.id, content_hash=content_hash).one().remote_id
+        db.session.commit()
+        return remote_id
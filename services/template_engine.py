@@ -23,6 +23,27 @@ class TemplateEngine:
             result = result.replace(f'{{{{{key}}}}}', str(value))
         return result
     
+    @staticmethod
+    def build_variables(email: str, data: dict, variable_mapping: dict = None) -> dict:
+        """Build a recipient's template variables, optionally through a variable mapping."""
+        if not variable_mapping:
+            variables = dict(data or {})
+            variables['email'] = email
+            return variables
+        
+        data = data or {}
+        variables = {'email': email}
+        for var_name, mapping in variable_mapping.items():
+            if mapping['type'] == 'field':
+                field_name = mapping['value']
+                if field_name == 'email':
+                    variables[var_name] = email
+                else:
+                    variables[var_name] = data.get(field_name, '')
+            elif mapping['type'] == 'custom':
+                variables[var_name] = mapping['value']
+        return variables
+    
     @staticmethod
     def extract_variables(template: str) -> list:
         """Extract variables from template. Supports both [variable] and {{variable}} syntax."""
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Rate accuracy checks for the campaign token bucket.
+Run with: python test_token_bucket.py (or pytest test_token_bucket.py)
+"""
+
+import threading
+import time
+
+from utils.token_bucket import TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_simulated_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(600, 'minute', burst=1, clock=clock, sleep=clock.sleep)
+    
+    for _ in range(1000):
+        bucket.acquire()
+    
+    # 600/min is 10/s; the first token is free, the other 999 take 99.9s
+    assert abs(clock.now - 99.9) < 1e-6, clock.now
+
+def test_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(60, 'minute', burst=20, clock=clock, sleep=clock.sleep)
+    
+    for _ in range(20):
+        bucket.acquire()
+    assert clock.now == 0
+    
+    bucket.acquire()
+    assert abs(clock.now - 1.0) < 1e-6
+    assert not bucket.try_acquire()
+
+def test_periods():
+    clock = FakeClock()
+    bucket = TokenBucket(86400, 'day', burst=1, clock=clock, sleep=clock.sleep)
+    
+    for _ in range(11):
+        bucket.acquire()
+    assert abs(clock.now - 10.0) < 1e-6
+    
+    bucket.set_rate(7200, 'hour', burst=1)
+    clock.now = 100.0
+    for _ in range(11):
+        bucket.acquire()
+    assert abs(clock.now - 105.0) < 1e-6
+
+def test_unlimited():
+    clock = FakeClock()
+    bucket = TokenBucket(0, clock=clock, sleep=clock.sleep)
+    
+    for _ in range(1000):
+        bucket.acquire()
+    assert clock.now == 0
+
+def test_threaded_rate():
+    rate = 200
+    bucket = TokenBucket(rate, 'second', burst=1)
+    count = rate * 2
+    per_thread = count // 8
+    
+    def send():
+        for _ in range(per_thread):
+            bucket.acquire()
+    
+    threads = [threading.Thread(target=send) for _ in range(8)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    
+    achieved = (count - 1) / elapsed
+    assert abs(achieved - rate) / rate < 0.05, achieved
+
+if __name__ == '__main__':
+    test_simulated_rate()
+    print("✓ 1000 tokens at 600/min took 99.9s")
+    test_burst()
+    print("✓ Burst of 20 served immediately")
+    test_periods()
+    print("✓ Per-day and per-hour rates")
+    test_unlimited()
+    print("✓ Rate 0 is unlimited")
+    test_threaded_rate()
+    print("✓ 8 threads held 200/s within 5%")
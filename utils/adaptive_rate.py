@@ -0,0 +1,67 @@
+import threading
+import time
+
+class AdaptiveRate:
+    """AIMD controller for a TokenBucket's rate.
+
+    Starts at ``ceiling`` (the configured or discovered provider limit). A
+    throttled send cuts the rate by ``decrease``, at most once per
+    ``cooldown`` seconds so one burst of rejected in-flight sends counts as
+    a single signal. Each second's worth of clean sends adds
+    ``increase * ceiling`` back, up to the ceiling.
+    """
+    
+    def __init__(self, bucket, decrease: float = 0.5, increase: float = 0.05, min_fraction: float = 0.02,
+                 cooldown: float = 1.0, clock=time.monotonic):
+        self.bucket = bucket
+        self.decrease = decrease
+        self.increase = increase
+        self.min_fraction = min_fraction
+        self.cooldown = cooldown
+        self.clock = clock
+        self.ceiling = None
+        self.period = None
+        self.burst = None
+        self.rate = None
+        self._successes = 0
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+    
+    def configure(self, ceiling: float, per: str = 'minute', burst: int = None):
+        """Set the upper bound; the learned rate is kept unless the limit itself changed."""
+        with self._lock:
+            if (ceiling, per, burst) == (self.ceiling, self.period, self.burst):
+                return
+            self.ceiling, self.period, self.burst = ceiling, per, burst
+            self.rate = ceiling
+            self._successes = 0
+            self.bucket.set_rate(ceiling, per, burst)
+    
+    def observe(self, result: dict):
+        if not self.ceiling:
+            return
+        if result.get('throttled'):
+            self.throttled()
+        elif result.get('success'):
+            self.succeeded()
+    
+    def throttled(self):
+        with self._lock:
+            now = self.clock()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self._successes = 0
+            self.rate = max(self.ceiling * self.min_fraction, self.rate * self.decrease)
+            self.bucket.set_rate(self.rate, self.period, self.burst)
+    
+    def succeeded(self):
+        with self._lock:
+            if self.rate >= self.ceiling:
+                return
+            self._successes += 1
+            # One probe step per second's worth of sends at the current rate
+            if self._successes >= max(1, self.bucket.fill_rate):
+                self._successes = 0
+                self.rate = min(self.ceiling, self.rate + self.ceiling * self.increase)
+                self.bucket.set_rate(self.rate, self.period, self.burst)
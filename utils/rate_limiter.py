@@ -1,26 +1,276 @@
+import math
+import threading
 import time
-from collections import defaultdict
 
-class RateLimiter:
+def _slide(state, now: float, window: float):
+    """Roll (window_start, prev, count) forward to the window containing ``now``."""
+    start, prev, count = state
+    current = now - now % window
+    if start != current:
+        prev = count if start == current - window else 0
+        count = 0
+    return current, prev, count
+
+def _available(prev: int, count: int, elapsed: float, limit: int, window: float) -> float:
+    return limit - (prev * (window - elapsed) / window + count)
+
+def _estimate(state, now: float, window: float) -> float:
+    """Requests counted against a key over the last ``window`` seconds."""
+    start, prev, count = _slide(state, now, window)
+    return prev * (window - (now - start)) / window + count
+
+def _wait_time(prev: int, count: int, elapsed: float, limit: int, window: float) -> float:
+    """Seconds until one more request fits, assuming no other requests arrive."""
+    need = limit - 1
+    if count <= need:
+        if prev <= 0:
+            return 0.0
+        return max(0.0, window * (1 - (need - count) / prev) - elapsed)
+    # The current window alone is over the limit; wait for it to slide out
+    return (window - elapsed) + window * (1 - need / count)
+
+def _take(state, now: float, limit: int, window: float, cost: int):
+    """Apply a hit of ``cost`` to a window state; returns (state, granted, wait)."""
+    start, prev, count = _slide(state, now, window)
+    elapsed = now - start
+    granted = min(cost, max(0, math.floor(_available(prev, count, elapsed, limit, window) + 1e-9)))
+    count += granted
+    wait = 0.0 if granted else _wait_time(prev, count, elapsed, limit, window)
+    return (start, prev, count), granted, wait
+
+class MemoryRateLimitStore:
+    """Sliding-window counters held in this process. Also the stand-in for Redis in development."""
+    name = 'memory'
+    SWEEP_INTERVAL = 60
+    
     def __init__(self):
-        self.limits = defaultdict(list)
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + self.SWEEP_INTERVAL
     
-    def check_limit(self, key: str, max_requests: int, window_seconds: int) -> bool:
-        now = time.time()
-        self.limits[key] = [t for t in self.limits[key] if now - t < window_seconds]
+    def hit(self, key: str, limit: int, window: float, cost: int, now: float):
+        with self._lock:
+            state, _ = self._counters.get(key, ((now - now % window, 0, 0), None))
+            state, granted, wait = _take(state, now, limit, window, cost)
+            self._counters[key] = (state, state[0] + 2 * window)
+            
+            if now >= self._next_sweep:
+                self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+                self._next_sweep = now + self.SWEEP_INTERVAL
+        return granted, wait
+    
+    def usage(self, key: str, window: float, now: float) -> float:
+        with self._lock:
+            entry = self._counters.get(key)
+        return _estimate(entry[0], now, window) if entry else 0.0
+
+class SQLRateLimitStore:
+    """Sliding-window counters in the ``rate_limits`` table, shared by every process on the database.
+
+    Each hit is a read followed by a conditional UPDATE on the row's previous
+    values, retried if another process updated it first.
+    """
+    name = 'sql'
+    SWEEP_INTERVAL = 60
+    MAX_RETRIES = 10
+    
+    def __init__(self):
+        self._next_sweep = 0
+    
+    def hit(self, key: str, limit: int, window: float, cost: int, now: float):
+        from models import db
+        from models.rate_limit import RateLimitCounter
+        from sqlalchemy import select, insert, update, delete
+        from sqlalchemy.exc import IntegrityError
         
-        if len(self.limits[key]) >= max_requests:
-            return False
+        table = RateLimitCounter.__table__
         
-        self.limits[key].append(now)
-        return True
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.SWEEP_INTERVAL
+            with db.engine.begin() as conn:
+                conn.execute(delete(table).where(table.c.expires_at < now))
+        
+        for _ in range(self.MAX_RETRIES):
+            try:
+                with db.engine.begin() as conn:
+                    row = conn.execute(
+                        select(table.c.window_start, table.c.prev_count, table.c.count).where(table.c.key == key)
+                    ).first()
+                    state = tuple(row) if row else (now - now % window, 0, 0)
+                    new_state, granted, wait = _take(state, now, limit, window, cost)
+                    values = {
+                        'window_start': new_state[0],
+                        'prev_count': new_state[1],
+                        'count': new_state[2],
+                        'expires_at': new_state[0] + 2 * window
+                    }
+                    
+                    if row is None:
+                        conn.execute(insert(table).values(key=key, **values))
+                        return granted, wait
+                    
+                    if new_state == state:
+                        return granted, wait
+                    
+                    updated = conn.execute(update(table).where(
+                        table.c.key == key,
+                        table.c.window_start == state[0],
+                        table.c.count == state[2]
+                    ).values(**values))
+                    if updated.rowcount:
+                        return granted, wait
+            except IntegrityError:
+                # Another process inserted the row first
+                continue
+        
+        raise RuntimeError(f'Rate limit counter for {key} is too contended')
     
-    def get_wait_time(self, key: str, max_requests: int, window_seconds: int) -> float:
+    def usage(self, key: str, window: float, now: float) -> float:
+        from models import db
+        from models.rate_limit import RateLimitCounter
+        from sqlalchemy import select
+        
+        table = RateLimitCounter.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.window_start, table.c.prev_count, table.c.count).where(table.c.key == key)
+            ).first()
+        return _estimate(tuple(row), now, window) if row else 0.0
+
+class RedisRateLimitStore:
+    """Sliding-window counters in Redis (or any server speaking its protocol), updated by one script call."""
+    name = 'redis'
+    SCRIPT = """
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[4])
+local current = now - (now % window)
+local state = redis.call('HMGET', KEYS[1], 'start', 'prev', 'count')
+local start = tonumber(state[1]) or current
+local prev = tonumber(state[2]) or 0
+local count = tonumber(state[3]) or 0
+if start ~= current then
+    if start == current - window then prev = count else prev = 0 end
+    count = 0
+end
+local available = tonumber(ARGV[1]) - (prev * (window - (now - current)) / window + count)
+local granted = math.min(tonumber(ARGV[3]), math.max(0, math.floor(available + 1e-9)))
+count = count + granted
+redis.call('HSET', KEYS[1], 'start', tostring(current), 'prev', prev, 'count', count)
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 2000))
+return {granted, prev, count, tostring(current)}
+"""
+
+    def __init__(self, url: str):
+        import redis
+        
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+    
+    def hit(self, key: str, limit: int, window: float, cost: int, now: float):
+        granted, prev, count, start = self.script(keys=[f'ratelimit:{key}'], args=[limit, window, cost, repr(now)])
+        wait = 0.0 if granted else _wait_time(int(prev), int(count), now - float(start), limit, window)
+        return int(granted), wait
+    
+    def usage(self, key: str, window: float, now: float) -> float:
+        start, prev, count = self.client.hmget(f'ratelimit:{key}', 'start', 'prev', 'count')
+        if start is None:
+            return 0.0
+        return _estimate((float(start), int(prev), int(count)), now, window)
+
+class RateLimiter:
+    """Sliding-window-counter rate limiter with O(1) state per key.
+
+    The estimate for a key is ``prev * (1 - elapsed / window) + count``, so
+    each check is one constant-size update in the shared store. Two local
+    fast paths avoid a round trip: a denied key is remembered until its
+    retry time, and ``lease`` lets a caller take several permits at once
+    and spend them from memory.
+    """
+    _instances = {}
+    MAX_LOCAL_KEYS = 10000
+    
+    def __init__(self, store=None):
+        self.store = store or MemoryRateLimitStore()
+        self._blocked = {}
+        self._leases = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def default() -> 'RateLimiter':
+        """The limiter for RATE_LIMIT_BACKEND ('sql', 'redis' or 'memory'), shared within this process."""
+        from flask import current_app
+        
+        config = current_app.config
+        name = config.get('RATE_LIMIT_BACKEND', 'sql')
+        if name not in RateLimiter._instances:
+            if name == 'sql':
+                store = SQLRateLimitStore()
+            elif name == 'redis':
+                store = RedisRateLimitStore(config['RATE_LIMIT_REDIS_URL'])
+            elif name == 'memory':
+                store = MemoryRateLimitStore()
+            else:
+                raise ValueError(f'Unknown rate limit backend: {name}')
+            RateLimiter._instances[name] = RateLimiter(store)
+        return RateLimiter._instances[name]
+    
+    def _hit(self, key: str, max_requests: int, window_seconds: float, lease: int):
         now = time.time()
-        self.limits[key] = [t for t in self.limits[key] if now - t < window_seconds]
+        with self._lock:
+            blocked_until = self._blocked.get(key)
+            if blocked_until is not None:
+                if now < blocked_until:
+                    return False, blocked_until - now
+                del self._blocked[key]
+            
+            remaining, expires_at = self._leases.get(key, (0, 0))
+            if remaining and now < expires_at:
+                self._leases[key] = (remaining - 1, expires_at)
+                return True, 0.0
         
-        if len(self.limits[key]) < max_requests:
-            return 0
+        granted, wait = self.store.hit(key, max_requests, window_seconds, max(1, lease), now)
         
-        oldest = min(self.limits[key])
-        return window_seconds - (now - oldest)
+        with self._lock:
+            if len(self._blocked) + len(self._leases) > self.MAX_LOCAL_KEYS:
+                self._blocked = {k: until for k, until in self._blocked.items() if until > now}
+                self._leases = {k: lease for k, lease in self._leases.items() if lease[1] > now}
+            if not granted:
+                self._blocked[key] = now + wait
+                return False, wait
+            if granted > 1:
+                self._leases[key] = (granted - 1, now + window_seconds)
+            else:
+                self._leases.pop(key, None)
+        return True, 0.0
+    
+    def check_limit(self, key: str, max_requests: int, window_seconds: float, lease: int = 1) -> bool:
+        allowed, _ = self._hit(key, max_requests, window_seconds, lease)
+        return allowed
+    
+    def get_wait_time(self, key: str, max_requests: int, window_seconds: float) -> float:
+        now = time.time()
+        with self._lock:
+            blocked_until = self._blocked.get(key)
+            if blocked_until is not None and now < blocked_until:
+                return blocked_until - now
+        _, wait = self.store.hit(key, max_requests, window_seconds, 0, now)
+        return wait
+    
+    def usage(self, key: str, window_seconds: float) -> float:
+        """Requests allowed for ``key`` over the last window, across every process sharing the store."""
+        return self.store.usage(key, window_seconds, time.time())
+    
+    def acquire(self, key: str, max_requests: int, window_seconds: float, lease: int = 1,
+                stop=None, poll: float = 0.1) -> bool:
+        """Block until a request for ``key`` is allowed.
+
+        While waiting, ``stop`` is called at least every ``poll`` seconds;
+        if it returns true the wait is abandoned and False is returned.
+        """
+        while True:
+            allowed, wait = self._hit(key, max_requests, window_seconds, lease)
+            if allowed:
+                return True
+            if stop and stop():
+                return False
+            time.sleep(max(min(wait, poll) if stop else wait, 0.001))
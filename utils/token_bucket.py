@@ -0,0 +1,70 @@
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket with reservation-based scheduling.
+
+    Tokens refill continuously at ``rate`` per ``per`` up to ``burst``. A
+    caller that finds the bucket empty reserves the next token anyway and is
+    told exactly how long to wait for it, so waiters are served in order and
+    the long-run rate matches the target regardless of send latency.
+    """
+    PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+    
+    def __init__(self, rate: float, per: str = 'minute', burst: int = None, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.tokens = 0
+        self.fill_rate = 0
+        self.updated_at = clock()
+        self.set_rate(rate, per, burst)
+        self.tokens = self.capacity
+    
+    def set_rate(self, rate: float, per: str = 'minute', burst: int = None):
+        if per not in self.PERIODS:
+            raise ValueError(f'Unknown rate period: {per}')
+        with self._lock:
+            self._refill(self.clock())
+            self.fill_rate = rate / self.PERIODS[per] if rate else 0
+            # Default burst is one second's worth of tokens
+            self.capacity = max(1, burst or int(self.fill_rate))
+            self.tokens = min(self.tokens, self.capacity)
+    
+    def _refill(self, now: float):
+        if self.fill_rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.fill_rate)
+        self.updated_at = now
+    
+    def reserve(self, tokens: int = 1) -> float:
+        """Take ``tokens`` now and return how many seconds to wait before using them."""
+        with self._lock:
+            if not self.fill_rate:
+                return 0.0
+            now = self.clock()
+            self._refill(now)
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.fill_rate
+    
+    def refund(self, tokens: int = 1):
+        """Give back reserved tokens that will not be used."""
+        with self._lock:
+            if self.fill_rate:
+                self.tokens = min(self.capacity, self.tokens + tokens)
+    
+    def try_acquire(self, tokens: int = 1) -> bool:
+        with self._lock:
+            if not self.fill_rate:
+                return True
+            self._refill(self.clock())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+    
+    def acquire(self, tokens: int = 1):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            self.sleep(delay)
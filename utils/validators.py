@@ -1,4 +1,5 @@
 import re
+from datetime import datetime, timezone
 from email_validator import validate_email, EmailNotValidError
 
 def is_valid_email(email: str) -> bool:
@@ -8,6 +9,13 @@ def is_valid_email(email: str) -> bool:
     except EmailNotValidError:
         return False
 
+def parse_schedule_time(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp into a naive UTC datetime (naive input is taken as UTC)."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
 def check_spam_score(subject: str, body: str) -> dict:
     score = 0
     flags = []
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Background worker for campaign sending. Also runs the campaign scheduler
+unless started with --no-scheduler.
+
+SQL backend (default):   python worker.py --concurrency 4
+One process per core:    python worker.py --processes 4
+Celery backend:          celery -A worker.celery worker
+                         python worker.py --scheduler-only   (exactly one)
+"""
+
+import argparse
+import logging
+import multiprocessing
+import signal
+
+from app_production import app
+from services.job_queue import JobQueue, Worker
+from services.sending_queue import SendingQueue  # also registers job handlers
+from services.scheduler import CampaignScheduler
+
+with app.app_context():
+    backend = JobQueue.backend()
+    celery = getattr(backend, 'celery', None)
+
+if celery is not None:
+    from celery.signals import worker_ready
+
+    @worker_ready.connect
+    def recover_on_start(**kwargs):
+        # Scheduled campaigns are fired by a single `worker.py --scheduler-only` process
+        with app.app_context():
+            SendingQueue.recover_orphans()
+
+def run_worker(queues, concurrency, poll_interval):
+    """Run one worker until SIGTERM/SIGINT; the target of each --processes child."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    worker = Worker(app, queues=queues, concurrency=concurrency, poll_interval=poll_interval)
+    
+    def shutdown(signum, frame):
+        worker.stop()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    worker.start()
+    worker.join()
+
+def run_scheduler():
+    """Fire scheduled campaigns without consuming jobs, until SIGTERM/SIGINT."""
+    scheduler = CampaignScheduler(app)
+    
+    def shutdown(signum, frame):
+        scheduler.stop()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    print("Campaign scheduler running (no jobs are consumed by this process)")
+    scheduler.start()
+    scheduler.join()
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the campaign sending worker')
+    parser.add_argument('--queue', action='append', dest='queues', help='Queue to consume (repeatable)')
+    parser.add_argument('--concurrency', type=int, help='Number of jobs to run in parallel')
+    parser.add_argument('--poll-interval', type=float, help='Seconds to wait when the queue is empty')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Worker processes to run; shards of a large campaign use one core each')
+    parser.add_argument('--no-scheduler', action='store_true', help='Do not fire scheduled campaigns from this worker')
+    parser.add_argument('--scheduler-only', action='store_true',
+                        help='Only fire scheduled campaigns; run one of these alongside Celery workers')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    
+    if args.scheduler_only:
+        return run_scheduler()
+    
+    if celery is not None:
+        print("JOB_QUEUE_BACKEND is 'celery' - start consumers with: celery -A worker.celery worker")
+        print("and the scheduler once with: python worker.py --scheduler-only")
+        return 1
+    
+    worker = Worker(app, queues=args.queues, concurrency=args.concurrency, poll_interval=args.poll_interval)
+    scheduler = None if args.no_scheduler else CampaignScheduler(app)
+    
+    # Extra processes get their own interpreter (and GIL); this one runs a worker too
+    spawn = multiprocessing.get_context('spawn')
+    children = [
+        spawn.Process(target=run_worker, args=(args.queues, args.concurrency, args.poll_interval), name=f'worker-{i}')
+        for i in range(1, max(args.processes, 1))
+    ]
+    
+    def shutdown(signum, frame):
+        print("\nStopping worker after current jobs finish...")
+        worker.stop()
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+        if scheduler:
+            scheduler.stop()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    
+    print("\n" + "="*60)
+    print(f"  SENDING WORKER - {worker.worker_id}")
+    print("="*60)
+    print(f"\n  Queues: {', '.join(worker.queues)}")
+    print(f"  Concurrency: {worker.concurrency}")
+    print(f"  Processes: {len(children) + 1}")
+    print(f"  Scheduler: {'off' if args.no_scheduler else 'on'}")
+    print("="*60 + "\n")
+    
+    with app.app_context():
+        recovered = SendingQueue.recover_orphans()
+    if recovered:
+        print(f"  Resuming orphaned campaigns: {', '.join(map(str, recovered))}\n")
+    
+    if scheduler:
+        scheduler.start()
+    for child in children:
+        child.start()
+    worker.start()
+    worker.join()
+    for child in children:
+        child.join()
+    if scheduler:
+        scheduler.join()
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())